@@ -27,6 +27,7 @@ BEGIN
     RETURN NEXT;
     
     -- 古い世代のテキストを間引き（1000世代以上前は10世代ごとに保持）
+    -- 本番では retention_worker.py を使用（カットオフを一度だけ計算し、小さなバッチで削除する）
     DELETE FROM texts t
     WHERE t.room_id IN (SELECT id FROM rooms WHERE is_active = true)
     AND t.generation < (
@@ -215,5 +216,6 @@ $$ LANGUAGE plpgsql;
 -- ========================================
 -- pg_cronが利用可能な場合のスケジュール設定例
 -- SELECT cron.schedule('cleanup-old-data', '0 2 * * *', $$SELECT cleanup_old_data(30)$$);
+-- texts/genomes/mutations の世代間引きは retention_worker.py を定期実行する
 -- SELECT cron.schedule('optimize-tables', '0 3 * * 0', $$SELECT optimize_tables()$$);
 -- SELECT cron.schedule('check-integrity', '0 1 * * *', $$SELECT check_data_integrity()$$);
\ No newline at end of file
@@ -0,0 +1,142 @@
+-- GA Novelist パーティション化された履歴テーブル
+-- PostgreSQL 15.x
+-- minimal_schema.sql の genomes / texts / mutations のパーティション版
+--
+-- genomes / texts : room_id によるハッシュパーティション（インデックスを分割して肥大化を抑える）
+-- mutations       : created_at による月次レンジパーティション（期限切れはパーティションごとDROP）
+--
+-- 既存データの移行・入れ替え・将来パーティションの作成は partition_manager.py で行う
+-- 入れ替え完了までは *_partitioned という名前で既存テーブルと並存する
+
+-- ========================================
+-- 1. ゲノムテーブル（ハッシュパーティション）
+-- ========================================
+CREATE TABLE IF NOT EXISTS genomes_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    room_id UUID NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    generation INTEGER NOT NULL,
+    genome_data JSONB NOT NULL,
+    mutation_count INTEGER DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    -- パーティションキー（room_id）を含める必要がある
+    PRIMARY KEY (room_id, id),
+    UNIQUE(room_id, generation)
+) PARTITION BY HASH (room_id);
+
+CREATE INDEX IF NOT EXISTS idx_genomes_p_room_generation ON genomes_partitioned(room_id, generation DESC);
+
+CREATE TABLE IF NOT EXISTS genomes_h0 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE IF NOT EXISTS genomes_h1 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE IF NOT EXISTS genomes_h2 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE IF NOT EXISTS genomes_h3 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE IF NOT EXISTS genomes_h4 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE IF NOT EXISTS genomes_h5 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE IF NOT EXISTS genomes_h6 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE IF NOT EXISTS genomes_h7 PARTITION OF genomes_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+-- ========================================
+-- 2. テキスト履歴テーブル（ハッシュパーティション）
+-- ========================================
+CREATE TABLE IF NOT EXISTS texts_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    room_id UUID NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    generation INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (room_id, id),
+    UNIQUE(room_id, generation)
+) PARTITION BY HASH (room_id);
+
+CREATE INDEX IF NOT EXISTS idx_texts_p_room_generation ON texts_partitioned(room_id, generation DESC);
+
+CREATE TABLE IF NOT EXISTS texts_h0 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE IF NOT EXISTS texts_h1 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE IF NOT EXISTS texts_h2 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE IF NOT EXISTS texts_h3 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE IF NOT EXISTS texts_h4 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE IF NOT EXISTS texts_h5 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE IF NOT EXISTS texts_h6 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE IF NOT EXISTS texts_h7 PARTITION OF texts_partitioned FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+-- ========================================
+-- 3. 変更履歴テーブル（月次レンジパーティション）
+-- ========================================
+CREATE TABLE IF NOT EXISTS mutations_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    room_id UUID NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    operator VARCHAR(50) NOT NULL,
+    actor VARCHAR(100) DEFAULT 'anonymous',
+    generation_before INTEGER NOT NULL,
+    generation_after INTEGER NOT NULL,
+    text_preview TEXT,
+    -- パーティションキーなので NOT NULL
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (created_at, id)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_mutations_p_room ON mutations_partitioned(room_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_mutations_p_room_generation ON mutations_partitioned(room_id, generation_after, id);
+
+-- 月次パーティションが作成されていない期間の受け皿
+-- 月次パーティションは partition_manager.py create-future で事前に作成する
+CREATE TABLE IF NOT EXISTS mutations_default PARTITION OF mutations_partitioned DEFAULT;
+
+-- ========================================
+-- 移行中の二重書き込みトリガー
+-- ========================================
+-- partition_manager.py migrate が既存テーブルに設定し、swap で削除する
+-- バックフィル中に発生した INSERT / DELETE をパーティション版に反映する
+
+CREATE OR REPLACE FUNCTION dual_write_genomes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO genomes_partitioned (id, room_id, generation, genome_data, mutation_count, created_at)
+        VALUES (NEW.id, NEW.room_id, NEW.generation, NEW.genome_data, NEW.mutation_count, NEW.created_at)
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+
+    DELETE FROM genomes_partitioned WHERE room_id = OLD.room_id AND id = OLD.id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dual_write_texts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO texts_partitioned (id, room_id, generation, content, created_at)
+        VALUES (NEW.id, NEW.room_id, NEW.generation, NEW.content, NEW.created_at)
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+
+    DELETE FROM texts_partitioned WHERE room_id = OLD.room_id AND id = OLD.id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dual_write_mutations()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO mutations_partitioned (id, room_id, operator, actor, generation_before, generation_after, text_preview, created_at)
+        VALUES (NEW.id, NEW.room_id, NEW.operator, NEW.actor, NEW.generation_before, NEW.generation_after,
+                NEW.text_preview, COALESCE(NEW.created_at, CURRENT_TIMESTAMP))
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+
+    IF OLD.created_at IS NULL THEN
+        DELETE FROM mutations_partitioned WHERE id = OLD.id;
+    ELSE
+        -- created_at を指定してパーティションを絞り込む
+        DELETE FROM mutations_partitioned WHERE created_at = OLD.created_at AND id = OLD.id;
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,173 @@
+-- GA Novelist ルームの最新状態テーブル
+-- PostgreSQL 15.x
+--
+-- current_room_states ビューはルームごとに2つの LATERAL (ORDER BY generation DESC LIMIT 1) を、
+-- load_room は rooms / texts / genomes の結合を毎回実行する。
+-- room_heads はルーム名をキーに最新のテキストとゲノムを非正規化して保持し、
+-- texts / genomes へのトリガーで同じトランザクション内に更新する。
+--
+-- apply_schema.py が minimal_schema.sql の後、07_corpus_generation.sql の前に適用する。
+-- 適用時に既存ルーム（minimal_schema.sql の Room A〜D を含む）の行を作成する。
+-- 大量のルームがある環境での再作成と整合性チェックは room_heads.py で行う
+
+-- ========================================
+-- 1. 最新状態テーブル
+-- ========================================
+CREATE TABLE IF NOT EXISTS room_heads (
+    room_name VARCHAR(100) PRIMARY KEY,
+    room_id UUID NOT NULL UNIQUE REFERENCES rooms(id) ON DELETE CASCADE,
+    generation INTEGER NOT NULL DEFAULT 0, -- テキスト・ゲノムのうち新しい方の世代
+
+    text_generation INTEGER,
+    current_text TEXT,
+
+    genome_generation INTEGER,
+    genome_data JSONB,
+    mutation_count INTEGER DEFAULT 0,
+
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ========================================
+-- 2. ルーム作成時に空の最新状態を作成
+-- ========================================
+CREATE OR REPLACE FUNCTION sync_room_head_from_rooms()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO room_heads (room_name, room_id, generation, created_at, updated_at)
+    VALUES (NEW.name, NEW.id, COALESCE(NEW.current_generation, 0),
+            COALESCE(NEW.created_at, CURRENT_TIMESTAMP), COALESCE(NEW.updated_at, CURRENT_TIMESTAMP))
+    ON CONFLICT (room_name) DO NOTHING;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS room_heads_sync ON rooms;
+CREATE TRIGGER room_heads_sync
+AFTER INSERT ON rooms
+FOR EACH ROW EXECUTE FUNCTION sync_room_head_from_rooms();
+
+-- ========================================
+-- 3. テキストの追加・削除を反映
+-- ========================================
+CREATE OR REPLACE FUNCTION sync_room_head_from_texts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        -- rooms.name は一意でないので、同名のルームは最初に行を作ったルームだけを反映する。
+        -- 既存の最新世代より古いテキストでは上書きしない
+        INSERT INTO room_heads (room_name, room_id, generation, text_generation, current_text, created_at, updated_at)
+        SELECT r.name, r.id, NEW.generation, NEW.generation, NEW.content,
+               COALESCE(r.created_at, CURRENT_TIMESTAMP), COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+        FROM rooms r
+        WHERE r.id = NEW.room_id
+        ON CONFLICT (room_name) DO UPDATE SET
+            text_generation = EXCLUDED.text_generation,
+            current_text = EXCLUDED.current_text,
+            generation = GREATEST(EXCLUDED.text_generation, room_heads.genome_generation),
+            updated_at = GREATEST(room_heads.updated_at, EXCLUDED.updated_at)
+        WHERE room_heads.room_id = EXCLUDED.room_id
+          AND (room_heads.text_generation IS NULL
+               OR room_heads.text_generation <= EXCLUDED.text_generation);
+        RETURN NEW;
+    END IF;
+
+    -- 最新のテキストが削除された場合だけ、残りの最新世代を探し直す
+    UPDATE room_heads h
+    SET text_generation = t.generation,
+        current_text = t.content,
+        generation = COALESCE(GREATEST(t.generation, h.genome_generation), 0)
+    FROM (SELECT OLD.room_id AS room_id) k
+    LEFT JOIN LATERAL (
+        SELECT generation, content FROM texts
+        WHERE room_id = k.room_id
+        ORDER BY generation DESC
+        LIMIT 1
+    ) t ON true
+    WHERE h.room_id = k.room_id AND h.text_generation = OLD.generation;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS room_heads_sync ON texts;
+CREATE TRIGGER room_heads_sync
+AFTER INSERT OR DELETE ON texts
+FOR EACH ROW EXECUTE FUNCTION sync_room_head_from_texts();
+
+-- ========================================
+-- 4. ゲノムの追加・削除を反映
+-- ========================================
+CREATE OR REPLACE FUNCTION sync_room_head_from_genomes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO room_heads (room_name, room_id, generation, genome_generation, genome_data, mutation_count, created_at, updated_at)
+        SELECT r.name, r.id, NEW.generation, NEW.generation, NEW.genome_data, NEW.mutation_count,
+               COALESCE(r.created_at, CURRENT_TIMESTAMP), COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+        FROM rooms r
+        WHERE r.id = NEW.room_id
+        ON CONFLICT (room_name) DO UPDATE SET
+            genome_generation = EXCLUDED.genome_generation,
+            genome_data = EXCLUDED.genome_data,
+            mutation_count = EXCLUDED.mutation_count,
+            generation = GREATEST(EXCLUDED.genome_generation, room_heads.text_generation),
+            updated_at = GREATEST(room_heads.updated_at, EXCLUDED.updated_at)
+        WHERE room_heads.room_id = EXCLUDED.room_id
+          AND (room_heads.genome_generation IS NULL
+               OR room_heads.genome_generation <= EXCLUDED.genome_generation);
+        RETURN NEW;
+    END IF;
+
+    UPDATE room_heads h
+    SET genome_generation = g.generation,
+        genome_data = g.genome_data,
+        mutation_count = COALESCE(g.mutation_count, 0),
+        generation = COALESCE(GREATEST(g.generation, h.text_generation), 0)
+    FROM (SELECT OLD.room_id AS room_id) k
+    LEFT JOIN LATERAL (
+        SELECT generation, genome_data, mutation_count FROM genomes
+        WHERE room_id = k.room_id
+        ORDER BY generation DESC
+        LIMIT 1
+    ) g ON true
+    WHERE h.room_id = k.room_id AND h.genome_generation = OLD.generation;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS room_heads_sync ON genomes;
+CREATE TRIGGER room_heads_sync
+AFTER INSERT OR DELETE ON genomes
+FOR EACH ROW EXECUTE FUNCTION sync_room_head_from_genomes();
+
+-- ========================================
+-- 5. 既存ルームの最新状態を投入
+-- ========================================
+-- 同名のルームが複数ある場合はトリガーと同じく最初に作られたルームを使う。
+-- 既に行があるルームはトリガーが管理しているので上書きしない
+INSERT INTO room_heads (room_name, room_id, generation,
+                        text_generation, current_text,
+                        genome_generation, genome_data, mutation_count,
+                        created_at, updated_at)
+SELECT DISTINCT ON (r.name)
+       r.name, r.id,
+       COALESCE(GREATEST(t.generation, g.generation), r.current_generation, 0),
+       t.generation, t.content,
+       g.generation, g.genome_data, COALESCE(g.mutation_count, 0),
+       COALESCE(r.created_at, CURRENT_TIMESTAMP), COALESCE(r.updated_at, CURRENT_TIMESTAMP)
+FROM rooms r
+LEFT JOIN LATERAL (
+    SELECT generation, content FROM texts
+    WHERE room_id = r.id
+    ORDER BY generation DESC
+    LIMIT 1
+) t ON true
+LEFT JOIN LATERAL (
+    SELECT generation, genome_data, mutation_count FROM genomes
+    WHERE room_id = r.id
+    ORDER BY generation DESC
+    LIMIT 1
+) g ON true
+ORDER BY r.name, r.created_at, r.id
+ON CONFLICT (room_name) DO NOTHING;
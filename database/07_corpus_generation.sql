@@ -0,0 +1,66 @@
+-- GA Novelist コーパス世代カウンタと変更通知
+-- PostgreSQL 15.x
+--
+-- corpus_words / sentence_templates / phrase_patterns を更新するローダーは、
+-- 同じトランザクション内で bump_corpus_generation() を呼んで世代を1つ進める。
+-- 世代の更新と同時に NOTIFY corpus_changed を発行し、
+-- ペイロードは {"generation": 世代, "genres": [影響したジャンル]} の JSON。
+-- NOTIFY はコミット時に配送されるので、ロールバックした投入は通知されない。
+--
+-- キャッシュ側（corpus_cache.py）は通知を受けたジャンルだけを読み直す。
+-- 接続が切れて通知を取りこぼした場合は corpus_changes から追いつく。
+
+-- ========================================
+-- 1. 世代カウンタ（1行だけのテーブル）
+-- ========================================
+CREATE TABLE IF NOT EXISTS corpus_generation (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_generation (id, generation) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- ========================================
+-- 2. 変更履歴（取りこぼした通知の追いつき用）
+-- ========================================
+CREATE TABLE IF NOT EXISTS corpus_changes (
+    generation BIGINT PRIMARY KEY,
+    genres TEXT[] NOT NULL, -- NULL の要素はジャンル指定なし（全ジャンル共通）のテンプレート
+    source VARCHAR(100),
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ========================================
+-- 3. 世代を進めて通知
+-- ========================================
+CREATE OR REPLACE FUNCTION bump_corpus_generation(
+    p_genres TEXT[],
+    p_source VARCHAR DEFAULT NULL
+) RETURNS BIGINT AS $$
+DECLARE
+    new_generation BIGINT;
+    affected TEXT[];
+BEGIN
+    -- 行ロックで同時に投入するローダーを直列化し、世代の飛びや重複を防ぐ
+    UPDATE corpus_generation
+    SET generation = generation + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+    RETURNING generation INTO new_generation;
+
+    SELECT COALESCE(array_agg(DISTINCT g), '{}') INTO affected
+    FROM unnest(p_genres) AS g;
+
+    INSERT INTO corpus_changes (generation, genres, source)
+    VALUES (new_generation, affected, p_source);
+
+    PERFORM pg_notify('corpus_changed', json_build_object(
+        'generation', new_generation,
+        'genres', affected
+    )::text);
+
+    RETURN new_generation;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,157 @@
+-- GA Novelist 辞書エンコードしたコーパス単語テーブル
+-- PostgreSQL 15.x
+--
+-- minimal_schema.sql の corpus_words は全行に UUID の主キー、VARCHAR(20) のジャンル名、
+-- VARCHAR(50) のスロット名を持ち、(genre, slot_type) インデックスも文字列で肥大化する。
+-- corpus_words_compact はジャンルを genres（03_corpus_schema.sql）の id、
+-- スロットを corpus_slots の id に置き換え、主キーを identity にする。
+-- (genre_id, slot_id) INCLUDE (word, weight) のインデックスでスロット単位の読み出しを
+-- インデックスオンリースキャンで返す。
+--
+-- 既存データの移行と入れ替えは corpus_compact.py で行う。
+-- 入れ替え後は corpus_words という名前の互換ビューが残り、
+-- corpus.jl などの既存の SELECT はそのまま動く。
+-- ただし互換ビューの corpus_words.id は UUID ではなく corpus_words_compact の
+-- integer になる（id を UUID として扱うコードは入れ替え前に直すこと）。
+-- ビューは ON CONFLICT の対象にできないため、INSERT ... ON CONFLICT (genre, slot_type, word)
+-- は入れ替え後に失敗する。書き込みは corpus_compact.upsert_words() か
+-- corpus_words_compact への直接の INSERT で行う
+
+-- ========================================
+-- 1. ジャンル（03_corpus_schema.sql と同じ定義、未適用の環境向け）
+-- ========================================
+CREATE TABLE IF NOT EXISTS genres (
+    id SERIAL PRIMARY KEY,
+    code VARCHAR(20) NOT NULL UNIQUE,  -- 'neutral', 'horror', 'romance', 'scifi', 'comedy'
+    name_ja VARCHAR(50) NOT NULL,
+    name_en VARCHAR(50) NOT NULL,
+    description TEXT,
+    color_code VARCHAR(7),  -- UI表示用の色
+    sort_order INTEGER DEFAULT 0
+);
+
+INSERT INTO genres (code, name_ja, name_en, description, color_code, sort_order) VALUES
+    ('neutral', '中立', 'Neutral', '基本的な語彙', '#808080', 0),
+    ('horror', 'ホラー', 'Horror', '恐怖・サスペンス要素', '#8B0000', 1),
+    ('romance', 'ロマンス', 'Romance', '恋愛・感動要素', '#FF69B4', 2),
+    ('scifi', 'SF', 'Sci-Fi', 'SF・未来要素', '#4169E1', 3),
+    ('comedy', 'コメディ', 'Comedy', 'ユーモア・笑い要素', '#FF8C00', 4),
+    ('mystery', 'ミステリー', 'Mystery', '推理・謎解き要素', '#4B0082', 5),
+    ('fantasy', 'ファンタジー', 'Fantasy', '魔法・幻想要素', '#9370DB', 6)
+ON CONFLICT (code) DO NOTHING;
+
+-- ========================================
+-- 2. スロット定義
+-- ========================================
+CREATE TABLE IF NOT EXISTS corpus_slots (
+    id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE, -- '主体', '場所', '発見物', '動作', '感情', etc.
+    sort_order SMALLINT DEFAULT 0
+);
+
+INSERT INTO corpus_slots (code, sort_order) VALUES
+    ('主体', 0),
+    ('場所', 1),
+    ('発見物', 2),
+    ('動作', 3),
+    ('感情', 4)
+ON CONFLICT (code) DO NOTHING;
+
+-- コードから id を引く（未登録なら登録する）
+CREATE OR REPLACE FUNCTION corpus_genre_id(p_code VARCHAR)
+RETURNS SMALLINT AS $$
+DECLARE
+    v_id INTEGER;
+BEGIN
+    SELECT id INTO v_id FROM genres WHERE code = p_code;
+    IF v_id IS NULL THEN
+        INSERT INTO genres (code, name_ja, name_en) VALUES (p_code, p_code, p_code)
+        ON CONFLICT (code) DO NOTHING;
+        SELECT id INTO v_id FROM genres WHERE code = p_code;
+    END IF;
+    RETURN v_id::SMALLINT;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION corpus_slot_id(p_code VARCHAR)
+RETURNS SMALLINT AS $$
+DECLARE
+    v_id SMALLINT;
+BEGIN
+    SELECT id INTO v_id FROM corpus_slots WHERE code = p_code;
+    IF v_id IS NULL THEN
+        INSERT INTO corpus_slots (code) VALUES (p_code)
+        ON CONFLICT (code) DO NOTHING;
+        SELECT id INTO v_id FROM corpus_slots WHERE code = p_code;
+    END IF;
+    RETURN v_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ========================================
+-- 3. 辞書エンコードした単語テーブル
+-- ========================================
+-- 固定長の列を先に並べてアラインメントの詰め物を減らす
+CREATE TABLE IF NOT EXISTS corpus_words_compact (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    genre_id SMALLINT NOT NULL REFERENCES genres(id),
+    slot_id SMALLINT NOT NULL REFERENCES corpus_slots(id),
+    weight REAL DEFAULT 1.0,
+    word TEXT NOT NULL,
+
+    UNIQUE(genre_id, slot_id, word)
+);
+
+CREATE INDEX IF NOT EXISTS idx_corpus_words_compact_lookup
+    ON corpus_words_compact(genre_id, slot_id) INCLUDE (word, weight);
+
+-- ========================================
+-- 4. 移行中の二重書き込み（corpus_words -> corpus_words_compact）
+-- ========================================
+CREATE OR REPLACE FUNCTION dual_write_corpus_words()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM corpus_words_compact
+        WHERE genre_id = corpus_genre_id(OLD.genre)
+          AND slot_id = corpus_slot_id(OLD.slot_type)
+          AND word = OLD.word;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO corpus_words_compact (genre_id, slot_id, word, weight)
+        VALUES (corpus_genre_id(NEW.genre), corpus_slot_id(NEW.slot_type), NEW.word, NEW.weight)
+        ON CONFLICT (genre_id, slot_id, word) DO UPDATE SET weight = EXCLUDED.weight;
+        RETURN NEW;
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ========================================
+-- 5. 入れ替え後の互換ビュー corpus_words への書き込み
+-- ========================================
+-- ビュー本体は入れ替え時に corpus_compact.py が作成する
+CREATE OR REPLACE FUNCTION corpus_words_view_write()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO corpus_words_compact (genre_id, slot_id, word, weight)
+        VALUES (corpus_genre_id(NEW.genre), corpus_slot_id(NEW.slot_type), NEW.word,
+                COALESCE(NEW.weight, 1.0));
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE corpus_words_compact
+        SET genre_id = corpus_genre_id(NEW.genre),
+            slot_id = corpus_slot_id(NEW.slot_type),
+            word = NEW.word,
+            weight = NEW.weight
+        WHERE id = OLD.id;
+        RETURN NEW;
+    END IF;
+
+    DELETE FROM corpus_words_compact WHERE id = OLD.id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 """
 青空文庫からコーパスデータを抽出してRDS PostgreSQLに投入
+
+抽出結果は作品ごとのシャードとしてステージングディレクトリに書き出し（corpus_staging.py）、
+DBへの投入は corpus_loader.py がシャードをまとめて行う。
+
+使い方:
+  python aozora_to_corpus.py                       # 抽出して投入
+  python aozora_to_corpus.py extract --works 482,427
+  python corpus_loader.py --staging-dir corpus_staging
 """
 import re
 import json
-import uuid
-import psycopg2
 import requests
 import zipfile
 import io
-from collections import Counter, defaultdict
+from collections import Counter
 from typing import Dict, List, Tuple
 
+from corpus_staging import read_index, write_shard
+
+DEFAULT_STAGING_DIR = 'corpus_staging'
+
 # 青空文庫の作品情報
 # 作品番号: (タイトル, 作者, ジャンル)
+# ジャンルが None の作品はラベル付き作品で学習した分類器でジャンルを推定する
 AOZORA_WORKS = {
     # horror
     '482': ('人間椅子', '江戸川乱歩', 'horror'),
@@ -43,6 +54,45 @@ AOZORA_WORKS = {
     '74': ('蜜蛛の糸', '芥川龍之介', 'neutral'),
 }
 
+# ジャンル別のキーワードパターン
+GENRE_KEYWORDS = {
+    'horror': {
+        '主体': ['幽霊', '影', '何者', '怪物', '黒い', '死者', '亡霊', '悪魔'],
+        '場所': ['墓', '墓地', '墓場', '廃屋', '暗闇', '地下', '洞窟', '森'],
+        '発見物': ['血', 'ナイフ', '刀', '骸', '死体', '日記', '手紙'],
+        '動作': ['震え', '叫び', '叫ん', '逃げ', '襲い', 'うめき', '怖'],
+        '感情': ['恐怖', '恐ろし', '不安', '不気味', '怖い', '怯え', '恐怖']
+    },
+    'romance': {
+        '主体': ['君', 'あなた', '恋人', '彼', '彼女', '二人', '私たち'],
+        '場所': ['公園', 'カフェ', '海', '橋', '駅', 'ベンチ', '教会'],
+        '発見物': ['花', '手紙', '指輪', 'プレゼント', '写真', '日記'],
+        '動作': ['抱き', 'キス', '手を', '微笑', '見つめ', '笑っ'],
+        '感情': ['愛', '恋', '幸せ', '優し', '切な', '悲し', '嬉し']
+    },
+    'scifi': {
+        '主体': ['ロボット', '機械', '宇宙', '科学者', '研究者', '博士'],
+        '場所': ['宇宙', '研究所', '実験室', '火星', '月', '基地', '船'],
+        '発見物': ['機械', '装置', 'データ', '電波', '信号', 'エネルギー'],
+        '動作': ['分析', '計算', '観測', '実験', '発射', '探査'],
+        '感情': ['驚き', '発見', '進歩', '未来', '科学的']
+    },
+    'comedy': {
+        '主体': ['変な', 'おかしな', 'ドジ', 'マヌケ', 'おっちょこちょい'],
+        '場所': ['舞台', 'サーカス', '祭', '広場', '市場'],
+        '発見物': ['バナナ', 'パイ', '変な', 'おかしな'],
+        '動作': ['転び', '転ん', '滑っ', 'ぶつか', '倒れ'],
+        '感情': ['楽し', 'おかし', '笑', '面白', '愉快']
+    },
+    'neutral': {
+        '主体': ['人', '彼', '彼女', '私', 'みんな', '先生', '子供'],
+        '場所': ['部屋', '家', '学校', '公園', '街', '駅', '店'],
+        '発見物': ['本', '手紙', '新聞', '時計', 'カバン', '写真'],
+        '動作': ['歩く', '話す', '見る', '考える', '読む', '書く'],
+        '感情': ['嬉し', '悲し', '驚', '不思議', '穏やか']
+    }
+}
+
 def download_aozora_text(work_id: str) -> str:
     """青空文庫からテキストをダウンロード"""
     # 青空文庫のGitHubからテキストを取得
@@ -130,47 +180,8 @@ def extract_words_by_genre(text: str, genre: str) -> Dict[str, List[str]]:
         '感情': [],
     }
     
-    # ジャンル別のキーワードパターン
-    patterns = {
-        'horror': {
-            '主体': ['幽霊', '影', '何者', '怪物', '黒い', '死者', '亡霊', '悪魔'],
-            '場所': ['墓', '墓地', '墓場', '廃屋', '暗闇', '地下', '洞窟', '森'],
-            '発見物': ['血', 'ナイフ', '刀', '骸', '死体', '日記', '手紙'],
-            '動作': ['震え', '叫び', '叫ん', '逃げ', '襲い', 'うめき', '怖'],
-            '感情': ['恐怖', '恐ろし', '不安', '不気味', '怖い', '怯え', '恐怖']
-        },
-        'romance': {
-            '主体': ['君', 'あなた', '恋人', '彼', '彼女', '二人', '私たち'],
-            '場所': ['公園', 'カフェ', '海', '橋', '駅', 'ベンチ', '教会'],
-            '発見物': ['花', '手紙', '指輪', 'プレゼント', '写真', '日記'],
-            '動作': ['抱き', 'キス', '手を', '微笑', '見つめ', '笑っ'],
-            '感情': ['愛', '恋', '幸せ', '優し', '切な', '悲し', '嬉し']
-        },
-        'scifi': {
-            '主体': ['ロボット', '機械', '宇宙', '科学者', '研究者', '博士'],
-            '場所': ['宇宙', '研究所', '実験室', '火星', '月', '基地', '船'],
-            '発見物': ['機械', '装置', 'データ', '電波', '信号', 'エネルギー'],
-            '動作': ['分析', '計算', '観測', '実験', '発射', '探査'],
-            '感情': ['驚き', '発見', '進歩', '未来', '科学的']
-        },
-        'comedy': {
-            '主体': ['変な', 'おかしな', 'ドジ', 'マヌケ', 'おっちょこちょい'],
-            '場所': ['舞台', 'サーカス', '祭', '広場', '市場'],
-            '発見物': ['バナナ', 'パイ', '変な', 'おかしな'],
-            '動作': ['転び', '転ん', '滑っ', 'ぶつか', '倒れ'],
-            '感情': ['楽し', 'おかし', '笑', '面白', '愉快']
-        },
-        'neutral': {
-            '主体': ['人', '彼', '彼女', '私', 'みんな', '先生', '子供'],
-            '場所': ['部屋', '家', '学校', '公園', '街', '駅', '店'],
-            '発見物': ['本', '手紙', '新聞', '時計', 'カバン', '写真'],
-            '動作': ['歩く', '話す', '見る', '考える', '読む', '書く'],
-            '感情': ['嬉し', '悲し', '驚', '不思議', '穏やか']
-        }
-    }
-    
     # パターンマッチング
-    genre_patterns = patterns.get(genre, patterns['neutral'])
+    genre_patterns = GENRE_KEYWORDS.get(genre, GENRE_KEYWORDS['neutral'])
     
     for slot_type, keywords in genre_patterns.items():
         for keyword in keywords:
@@ -249,31 +260,34 @@ def extract_phrases(text: str, genre: str) -> List[str]:
     
     return phrases
 
-def process_and_insert_to_db(conn_info: dict):
-    """青空文庫データを処理してDBに投入"""
-    # PostgreSQL接続
-    conn = psycopg2.connect(
-        host=conn_info['endpoint'],
-        port=conn_info['port'],
-        database=conn_info['database'],
-        user=conn_info['username'],
-        password=conn_info['password']
-    )
-    cur = conn.cursor()
+def extract_work(text: str, genre: str) -> Tuple[Dict[str, Dict[str, int]], List[str], List[str]]:
+    """1作品から (スロット別の単語出現回数, 文テンプレート, フレーズ) を抽出"""
+    words = {
+        slot_type: dict(Counter(word_list))
+        for slot_type, word_list in extract_words_by_genre(text, genre).items()
+    }
+    return words, extract_sentence_patterns(text, genre), extract_phrases(text, genre)
+
+def extract_to_staging(staging_dir: str, work_ids: List[str] = None, force: bool = False) -> int:
+    """作品をダウンロード・前処理・抽出し、作品ごとのシャードに書き出す
+
+    DBには接続しない。索引に載っている作品は force=True でない限り飛ばすので、
+    途中で落ちても再実行すれば残りの作品から続けられる。
+    ジャンルが None の作品は本文だけを保存し、投入時に分類してから抽出する。
+    """
+    staged = read_index(staging_dir)
+    written = 0
     
     print("📚 青空文庫からコーパスデータを抽出中...")
     print("=" * 60)
     
-    # ジャンル別に集計
-    genre_data = defaultdict(lambda: {
-        'words': defaultdict(list),
-        'templates': [],
-        'phrases': []
-    })
-    
-    # 各作品を処理
-    for work_id, (title, author, genre) in AOZORA_WORKS.items():
-        print(f"\n📖 Processing: {title} by {author} ({genre})...")
+    for work_id in (work_ids or list(AOZORA_WORKS)):
+        title, author, genre = AOZORA_WORKS[work_id]
+        if work_id in staged and not force:
+            print(f"\n⏭️ Already staged: {title}")
+            continue
+        
+        print(f"\n📖 Processing: {title} by {author} ({genre or 'unlabeled'})...")
         
         # テキストダウンロード
         text = download_aozora_text(work_id)
@@ -285,93 +299,41 @@ def process_and_insert_to_db(conn_info: dict):
         text = preprocess_aozora(text)
         print(f"  ✅ Text length: {len(text)} chars")
         
-        # 単語抽出
-        words = extract_words_by_genre(text, genre)
-        for slot_type, word_list in words.items():
-            genre_data[genre]['words'][slot_type].extend(word_list)
-        
-        # 文テンプレート抽出
-        templates = extract_sentence_patterns(text, genre)
-        genre_data[genre]['templates'].extend(templates)
-        
-        # フレーズ抽出
-        phrases = extract_phrases(text, genre)
-        genre_data[genre]['phrases'].extend(phrases)
-    
-    print("\n" + "=" * 60)
-    print("📦 データベースに投入中...")
-    
-    # DBに投入
-    for genre, data in genre_data.items():
-        print(f"\n🎨 Genre: {genre}")
-        
-        # 1. corpus_wordsに投入
-        for slot_type, word_list in data['words'].items():
-            if word_list:
-                word_freq = Counter(word_list)
-                for word, count in word_freq.most_common(20):  # 各スロット上位20語
-                    weight = min(1.0, count / 10.0)
-                    cur.execute("""
-                        INSERT INTO corpus_words (id, genre, slot_type, word, weight)
-                        VALUES (%s, %s, %s, %s, %s)
-                        ON CONFLICT (genre, slot_type, word) 
-                        DO UPDATE SET weight = GREATEST(corpus_words.weight, EXCLUDED.weight)
-                    """, (str(uuid.uuid4()), genre, slot_type, word, weight))
-        
-        print(f"  ✅ Words inserted")
-        
-        # 2. sentence_templatesに投入
-        unique_templates = list(set(data['templates']))[:5]  # 重複除去して上位5個
-        for template in unique_templates:
-            if template:
-                cur.execute("""
-                    INSERT INTO sentence_templates (id, template_type, template, genre)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (template_type, template) DO NOTHING
-                """, (str(uuid.uuid4()), 'auto_extracted', template, genre))
-        
-        print(f"  ✅ Templates inserted")
-        
-        # 3. phrase_patternsに投入
-        unique_phrases = list(set(data['phrases']))[:10]  # 重複除去して上位10個
-        for phrase in unique_phrases:
-            if phrase:
-                cur.execute("""
-                    INSERT INTO phrase_patterns (id, genre, phrase)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (genre, phrase) DO NOTHING
-                """, (str(uuid.uuid4()), genre, phrase))
-        
-        print(f"  ✅ Phrases inserted")
-    
-    # コミット
-    conn.commit()
-    
-    # 統計表示
-    print("\n" + "=" * 60)
-    print("📊 投入結果:")
-    
-    cur.execute("SELECT genre, COUNT(*) FROM corpus_words GROUP BY genre")
-    for row in cur.fetchall():
-        print(f"  corpus_words ({row[0]}): {row[1]} entries")
-    
-    cur.execute("SELECT genre, COUNT(*) FROM sentence_templates WHERE genre IS NOT NULL GROUP BY genre")
-    for row in cur.fetchall():
-        print(f"  templates ({row[0]}): {row[1]} entries")
-    
-    cur.execute("SELECT genre, COUNT(*) FROM phrase_patterns GROUP BY genre")
-    for row in cur.fetchall():
-        print(f"  phrases ({row[0]}): {row[1]} entries")
-    
-    print("\n✅ 青空文庫コーパスデータの投入完了！")
+        if genre is None:
+            words, templates, phrases = {}, [], []
+        else:
+            words, templates, phrases = extract_work(text, genre)
+        write_shard(staging_dir, work_id, title, author, genre, text, words, templates, phrases)
+        written += 1
+    
+    print(f"\n✅ {written} works staged in {staging_dir}")
+    return written
+
+def process_and_insert_to_db(conn_info: dict, staging_dir: str = DEFAULT_STAGING_DIR):
+    """青空文庫データを処理してDBに投入（抽出してからシャードをまとめて投入）"""
+    from corpus_loader import load_staging
     
-    cur.close()
-    conn.close()
+    extract_to_staging(staging_dir)
+    load_staging(conn_info, staging_dir)
 
 if __name__ == "__main__":
-    # 接続情報を読み込み
-    with open('rds_connection_info.json', 'r') as f:
-        conn_info = json.load(f)
-    
-    # 処理実行
-    process_and_insert_to_db(conn_info)
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='青空文庫からコーパスを抽出してDBに投入')
+    parser.add_argument('command', nargs='?', default='all', choices=['all', 'extract'],
+                        help='all: 抽出して投入 / extract: ステージングへの抽出のみ（投入は corpus_loader.py）')
+    parser.add_argument('--staging-dir', default=DEFAULT_STAGING_DIR)
+    parser.add_argument('--works', help='抽出する作品番号（カンマ区切り、複数プロセスで分担する場合）')
+    parser.add_argument('--force', action='store_true', help='ステージング済みの作品も抽出し直す')
+    parser.add_argument('--conn-info', default='rds_connection_info.json', help='接続情報JSONファイル')
+    args = parser.parse_args()
+    
+    if args.command == 'extract':
+        extract_to_staging(args.staging_dir, args.works.split(',') if args.works else None, args.force)
+    else:
+        # 接続情報を読み込み
+        with open(args.conn_info, 'r') as f:
+            conn_info = json.load(f)
+        
+        # 処理実行
+        process_and_insert_to_db(conn_info, args.staging_dir)
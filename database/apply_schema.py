@@ -1,10 +1,23 @@
 #!/usr/bin/env python3
 """
 RDS PostgreSQL にスキーマを適用
+
+適用順:
+  1. minimal_schema.sql        テーブル本体（';' で文を分割して実行）
+  2. 06_room_heads.sql         ルームの最新状態テーブル（バックエンドの load_room / ルーム一覧が読む）
+  3. 07_corpus_generation.sql  コーパスの世代カウンタと通知関数
+
+05_partitioned_history.sql と 08_compact_corpus.sql はオンライン移行用なので、
+それぞれ partition_manager.py init / corpus_compact.py init で適用する。
 """
 import psycopg2
 import json
 
+from db_utils import apply_sql_file
+
+# minimal_schema.sql の後に適用するファイル（plpgsql を含むので分割せずに実行）
+FUNCTION_SCHEMA_FILES = ['06_room_heads.sql', '07_corpus_generation.sql']
+
 def apply_schema():
     # 接続情報を読み込み
     with open('rds_connection_info.json', 'r') as f:
@@ -44,6 +57,10 @@ def apply_schema():
             except Exception as e:
                 print(f"    ❌ Error: {e}")
     
+    # room_heads の同期トリガー、ローダーが呼ぶ bump_corpus_generation() などの関数
+    for schema_file in FUNCTION_SCHEMA_FILES:
+        apply_sql_file(conn, schema_file)
+    
     print("\n✅ Schema applied successfully!")
     
     # テーブル一覧を確認
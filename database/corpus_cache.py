@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+コーパスのメモリキャッシュ（LISTEN corpus_changed で差分更新）
+
+corpus.jl は単語・テンプレート・フレーズを読むたびに接続してクエリを投げている。
+コーパスが変わるのはローダーが投入したときだけなので、起動時に全件読み込んでおき、
+07_corpus_generation.sql の NOTIFY corpus_changed を受けたジャンルだけを読み直す。
+定常状態の読み出しはクエリを発行しない。
+
+  - LISTEN してから世代と全件を読むので、読み込み中の変更も取りこぼさない
+  - 通知の世代が飛んでいる・再接続した場合は corpus_changes から影響ジャンルを集めて追いつく
+  - 読み直した辞書は新しいスナップショット（単語・テンプレート・フレーズ・世代）にまとめ、
+    参照の代入1回で差し替える。読み出し側はスナップショットを1つ取って使うのでロック不要で、
+    世代の混ざった結果を返すこともない
+
+ローダーは bump_generation() を投入と同じトランザクションで呼ぶ。
+
+使い方:
+  python corpus_cache.py apply    # 07_corpus_generation.sql を適用
+  python corpus_cache.py status   # 現在の世代と直近の変更
+  python corpus_cache.py watch    # キャッシュを保持して変更を表示（動作確認用）
+"""
+import argparse
+import json
+import select
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import psycopg2
+
+from db_utils import apply_sql_file, connect
+
+SCHEMA_FILE = '07_corpus_generation.sql'
+CHANNEL = 'corpus_changed'
+SLOT_TYPES = ['主体', '場所', '発見物', '動作', '感情']
+
+
+def apply_schema(conn):
+    """世代カウンタと通知関数を作成"""
+    apply_sql_file(conn, SCHEMA_FILE)
+
+
+def bump_generation(cur, genres: Iterable[Optional[str]], source: str) -> Optional[int]:
+    """コーパスの世代を進めて corpus_changed を通知する
+
+    投入と同じトランザクション内で呼ぶこと（コミット時に通知が配送される）。
+    genres の None はジャンル指定なしのテンプレートを表す。
+    07_corpus_generation.sql が未適用なら何もせず None を返す。
+    """
+    cur.execute("SELECT to_regproc('bump_corpus_generation') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        print(f"⚠️ bump_corpus_generation() not found; apply {SCHEMA_FILE} to notify corpus caches")
+        return None
+
+    cur.execute("SELECT bump_corpus_generation(%s::text[], %s)",
+                (sorted(set(genres), key=lambda g: (g is None, g or '')), source))
+    return cur.fetchone()[0]
+
+
+class CorpusSnapshot(NamedTuple):
+    """ある世代のコーパス全体（公開後は変更しない）"""
+    # genre -> slot_type -> [(word, weight)]（重みの降順）
+    words: Dict[str, Dict[str, List[Tuple[str, float]]]]
+    # genre -> [template]、ジャンル指定なしのテンプレートは None をキーにする
+    templates: Dict[Optional[str], List[str]]
+    # genre -> [phrase]
+    phrases: Dict[str, List[str]]
+    generation: int
+
+
+class CorpusCache:
+    """コーパス全体をメモリに保持し、変更通知で該当ジャンルだけを更新する"""
+
+    def __init__(self, conn_info: dict):
+        self.conn_info = conn_info
+        self.conn = None
+        self._snapshot = CorpusSnapshot({}, {}, {}, 0)
+        self.refreshes = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ----------------------------------------
+    # 読み出し（クエリを発行しない）
+    # ----------------------------------------
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def snapshot(self) -> CorpusSnapshot:
+        """現在のスナップショット（複数の読み出しで世代を揃えたいときに使う）"""
+        return self._snapshot
+
+    def words(self, genre: str, slot_type: str) -> List[str]:
+        """get_corpus_from_db 相当（重みの降順）"""
+        return [word for word, _ in self._snapshot.words.get(genre, {}).get(slot_type, [])]
+
+    def weighted_words(self, genre: str, slot_type: str) -> List[Tuple[str, float]]:
+        return list(self._snapshot.words.get(genre, {}).get(slot_type, []))
+
+    def templates(self, genre: Optional[str] = None) -> List[str]:
+        """ジャンル用のテンプレートとジャンル指定なしのテンプレート"""
+        snap = self._snapshot
+        return snap.templates.get(genre or 'neutral', []) + snap.templates.get(None, [])
+
+    def phrases(self, genre: str) -> List[str]:
+        return list(self._snapshot.phrases.get(genre, []))
+
+    def genre_corpus(self, genre: str) -> Dict[str, List[str]]:
+        """get_genre_corpus 相当（空のスロットは neutral で補う）"""
+        words = self._snapshot.words
+
+        def slot(g: str, slot_type: str) -> List[str]:
+            return [word for word, _ in words.get(g, {}).get(slot_type, [])]
+
+        return {
+            slot_type: slot(genre, slot_type) or slot('neutral', slot_type)
+            for slot_type in SLOT_TYPES
+        }
+
+    @property
+    def genres(self) -> List[str]:
+        snap = self._snapshot
+        return sorted(set(snap.words) | set(snap.phrases)
+                      | {g for g in snap.templates if g is not None})
+
+    # ----------------------------------------
+    # 読み込みと通知の処理
+    # ----------------------------------------
+    def connect(self):
+        """LISTEN してから世代と全件を読み込む"""
+        self.conn = connect(self.conn_info)
+        self.conn.autocommit = True
+        cur = self.conn.cursor()
+        cur.execute(f"LISTEN {CHANNEL}")
+        cur.execute("SELECT generation FROM corpus_generation WHERE id = 1")
+        generation = cur.fetchone()[0]
+        cur.close()
+
+        self._load_all(generation)
+        return self
+
+    def _load_all(self, generation: int):
+        """全ジャンルを読み直す（消えたジャンルは新しいスナップショットに含めない）"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT DISTINCT genre FROM corpus_words "
+                    "UNION SELECT DISTINCT genre FROM phrase_patterns "
+                    "UNION SELECT DISTINCT genre FROM sentence_templates")
+        genres = [row[0] for row in cur.fetchall()]
+        cur.close()
+        self._refresh(genres, generation, CorpusSnapshot({}, {}, {}, generation))
+
+    def _refresh(self, genres: Iterable[Optional[str]], generation: int,
+                 base: Optional[CorpusSnapshot] = None):
+        """指定ジャンルを読み直し、base（既定は現在のスナップショット）と合わせて差し替える"""
+        base = base or self._snapshot
+        words_by_genre = dict(base.words)
+        templates_by_genre = dict(base.templates)
+        phrases_by_genre = dict(base.phrases)
+
+        cur = self.conn.cursor()
+        for genre in genres:
+            cur.execute("SELECT template FROM sentence_templates WHERE genre IS NOT DISTINCT FROM %s",
+                        (genre,))
+            templates = [row[0] for row in cur.fetchall()]
+            if genre is None:
+                templates_by_genre[None] = templates
+                continue
+
+            cur.execute("""
+                SELECT slot_type, word, weight FROM corpus_words
+                WHERE genre = %s
+                ORDER BY slot_type, weight DESC, word
+            """, (genre,))
+            words = {}
+            for slot_type, word, weight in cur.fetchall():
+                words.setdefault(slot_type, []).append((word, float(weight)))
+
+            cur.execute("SELECT phrase FROM phrase_patterns WHERE genre = %s", (genre,))
+            phrases = [row[0] for row in cur.fetchall()]
+
+            words_by_genre[genre] = words
+            templates_by_genre[genre] = templates
+            phrases_by_genre[genre] = phrases
+            self.refreshes += 1
+        cur.close()
+
+        self._snapshot = CorpusSnapshot(words_by_genre, templates_by_genre, phrases_by_genre,
+                                        generation)
+
+    def _catch_up(self):
+        """corpus_changes から自分の世代より後の変更をまとめて反映"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT generation FROM corpus_generation WHERE id = 1")
+        current = cur.fetchone()[0]
+        if current <= self.generation:
+            cur.close()
+            return []
+
+        cur.execute("SELECT MIN(generation) FROM corpus_changes WHERE generation > %s",
+                    (self.generation,))
+        oldest = cur.fetchone()[0]
+        if oldest is None or oldest > self.generation + 1:
+            # 履歴が消されていて差分が分からない場合は全件読み直す
+            cur.close()
+            self._load_all(current)
+            return self.genres
+
+        cur.execute("""
+            SELECT DISTINCT unnest(genres) FROM corpus_changes
+            WHERE generation > %s AND generation <= %s
+        """, (self.generation, current))
+        genres = [row[0] for row in cur.fetchall()]
+        cur.close()
+        self._refresh(genres, current)
+        return genres
+
+    def poll(self, timeout: float = 0.0) -> List[Optional[str]]:
+        """届いている通知を処理し、読み直したジャンルを返す"""
+        try:
+            if timeout > 0 and not select.select([self.conn], [], [], timeout)[0]:
+                return []
+            self.conn.poll()
+            notifies = list(self.conn.notifies)
+            del self.conn.notifies[:]
+
+            changed = []
+            for notify in notifies:
+                payload = json.loads(notify.payload)
+                generation = payload['generation']
+                if generation <= self.generation:
+                    continue
+                if generation > self.generation + 1:
+                    # 途中の通知を取りこぼしているので履歴から追いつく
+                    changed.extend(self._catch_up())
+                else:
+                    self._refresh(payload['genres'], generation)
+                    changed.extend(payload['genres'])
+            return list(dict.fromkeys(changed))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            print(f"⚠️ Connection lost ({e}), reconnecting...")
+            return self._reconnect()
+
+    def _reconnect(self) -> List[Optional[str]]:
+        try:
+            self.conn.close()
+        except psycopg2.Error:
+            pass
+        self.conn = connect(self.conn_info)
+        self.conn.autocommit = True
+        cur = self.conn.cursor()
+        cur.execute(f"LISTEN {CHANNEL}")
+        cur.close()
+        return self._catch_up()
+
+    def start(self, interval: float = 5.0):
+        """バックグラウンドのスレッドで通知を待ち受ける"""
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.poll(timeout=interval)
+                except psycopg2.Error as e:
+                    print(f"⚠️ Corpus cache refresh failed: {e}")
+                    time.sleep(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='corpus-cache', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.conn is not None:
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist コーパスの世代管理とキャッシュ')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('apply', help='世代カウンタと通知関数を作成')
+    sub.add_parser('status', help='現在の世代と直近の変更を表示')
+    p = sub.add_parser('watch', help='キャッシュを保持して変更を表示')
+    p.add_argument('--interval', type=float, default=5.0)
+
+    args = parser.parse_args()
+
+    with open(args.conn_info, 'r') as f:
+        conn_info = json.load(f)
+
+    if args.command == 'watch':
+        cache = CorpusCache(conn_info).connect()
+        print(f"📚 Loaded generation {cache.generation}: {', '.join(cache.genres)}")
+        try:
+            while True:
+                changed = cache.poll(timeout=args.interval)
+                if changed:
+                    print(f"🔄 Generation {cache.generation}: refreshed "
+                          f"{', '.join(g or '(all genres)' for g in changed)}")
+        except KeyboardInterrupt:
+            cache.close()
+        return
+
+    conn = connect(conn_info)
+    print(f"🔗 Connected to {conn_info['endpoint']}")
+    try:
+        if args.command == 'apply':
+            apply_schema(conn)
+        elif args.command == 'status':
+            cur = conn.cursor()
+            cur.execute("SELECT generation, updated_at FROM corpus_generation WHERE id = 1")
+            generation, updated_at = cur.fetchone()
+            print(f"📊 Corpus generation {generation} (updated {updated_at})")
+            cur.execute("""
+                SELECT generation, genres, source, changed_at FROM corpus_changes
+                ORDER BY generation DESC LIMIT 10
+            """)
+            for generation, genres, source, changed_at in cur.fetchall():
+                print(f"  {generation}: {', '.join(g or '(all genres)' for g in genres)} "
+                      f"by {source} at {changed_at}")
+            cur.close()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
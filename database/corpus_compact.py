@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+corpus_words を辞書エンコード版（corpus_words_compact）に移行するツール
+
+08_compact_corpus.sql で定義したテーブルへ、アプリを止めずに移行する。
+
+  init     08_compact_corpus.sql を適用
+  migrate  二重書き込みトリガーを設定し、既存データをバッチでバックフィル
+  swap     件数を確認してから corpus_words を corpus_words_legacy に改名し、
+           同じ名前の互換ビュー（INSTEAD OF トリガー付き）を作成
+  status   状態とテーブル・インデックスのサイズを表示
+
+ローダーは upsert_words() で書き込む。入れ替え前はテーブル、入れ替え後は
+corpus_words_compact に直接書くので、どちらの状態でも同じように呼べる。
+
+使い方:
+  python corpus_compact.py init
+  python corpus_compact.py migrate --batch-size 1000
+  python corpus_compact.py swap
+  python corpus_compact.py status
+"""
+import argparse
+import json
+from typing import List, Tuple
+
+from psycopg2.extras import execute_values
+
+from db_utils import apply_sql_file, connect, install_dual_write, keyset_backfill, swap_table
+
+SCHEMA_FILE = '08_compact_corpus.sql'
+
+# 入れ替え後の互換ビュー（既存の SELECT / INSERT の列名を保つ）
+# id は integer になり、ビューなので ON CONFLICT の対象にはできない
+CORPUS_WORDS_VIEW = """
+CREATE OR REPLACE VIEW corpus_words AS
+SELECT
+    w.id,
+    g.code AS genre,
+    s.code AS slot_type,
+    w.word,
+    w.weight::DECIMAL(3,2) AS weight
+FROM corpus_words_compact w
+JOIN genres g ON g.id = w.genre_id
+JOIN corpus_slots s ON s.id = w.slot_id
+"""
+
+
+def is_swapped(cur) -> bool:
+    """corpus_words が互換ビューに置き換わっているか"""
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = 'corpus_words'")
+    row = cur.fetchone()
+    return row is not None and row[0] == 'v'
+
+
+def upsert_words(cur, rows: List[Tuple[str, str, str, float]], keep_max: bool = True,
+                 page_size: int = 500) -> int:
+    """(genre, slot_type, word, weight) の行をまとめて書き込む
+
+    keep_max=True なら既存の単語は重みの大きい方を残し、False なら既存の単語はそのまま。
+    id はDB側で採番するので、行ごとに UUID を作る必要はない。
+    """
+    if not rows:
+        return 0
+
+    if not is_swapped(cur):
+        conflict = ("DO UPDATE SET weight = GREATEST(corpus_words.weight, EXCLUDED.weight)"
+                    if keep_max else "DO NOTHING")
+        execute_values(cur, f"""
+            INSERT INTO corpus_words (genre, slot_type, word, weight)
+            VALUES %s
+            ON CONFLICT (genre, slot_type, word) {conflict}
+        """, rows, page_size=page_size)
+        return len(rows)
+
+    # 未登録のジャンル・スロットを先に登録してから id に結合する
+    cur.execute("SELECT corpus_genre_id(c) FROM unnest(%s::text[]) c",
+                (sorted({row[0] for row in rows}),))
+    cur.execute("SELECT corpus_slot_id(c) FROM unnest(%s::text[]) c",
+                (sorted({row[1] for row in rows}),))
+
+    conflict = ("DO UPDATE SET weight = GREATEST(corpus_words_compact.weight, EXCLUDED.weight)"
+                if keep_max else "DO NOTHING")
+    execute_values(cur, f"""
+        INSERT INTO corpus_words_compact (genre_id, slot_id, word, weight)
+        SELECT g.id, s.id, v.word, v.weight::real
+        FROM (VALUES %s) AS v(genre, slot_type, word, weight)
+        JOIN genres g ON g.code = v.genre
+        JOIN corpus_slots s ON s.code = v.slot_type
+        ON CONFLICT (genre_id, slot_id, word) {conflict}
+    """, rows, page_size=page_size)
+    return len(rows)
+
+
+def apply_schema(conn):
+    """辞書テーブルと compact テーブルを作成"""
+    apply_sql_file(conn, SCHEMA_FILE)
+
+
+def backfill(conn, batch_size: int = 1000, sleep_seconds: float = 0.1) -> int:
+    """corpus_words の行を id のキーセット順に compact へコピー
+
+    二重書き込み済みの行はトリガーの方が新しいので、ON CONFLICT DO NOTHING で残す。
+    バッチの行は FOR SHARE でロックし、コピー中の行の DELETE や word の UPDATE が
+    コピーのコミット後にトリガーで反映されるようにする（FOR KEY SHARE では
+    id 以外を変える UPDATE を止められない）。
+    """
+    # 辞書を先に埋めておき、バッチ内では結合だけで id を引く
+    cur = conn.cursor()
+    cur.execute("SELECT corpus_genre_id(genre) FROM (SELECT DISTINCT genre FROM corpus_words) d")
+    cur.execute("SELECT corpus_slot_id(slot_type) FROM (SELECT DISTINCT slot_type FROM corpus_words) d")
+    conn.commit()
+    cur.close()
+
+    return keyset_backfill(conn, 'corpus_words', """
+        WITH batch AS (
+            SELECT id, genre, slot_type, word, weight FROM corpus_words
+            WHERE id > %s::uuid
+            ORDER BY id
+            LIMIT %s
+            FOR SHARE
+        ), inserted AS (
+            INSERT INTO corpus_words_compact (genre_id, slot_id, word, weight)
+            SELECT g.id, s.id, b.word, COALESCE(b.weight, 1.0)
+            FROM batch b
+            JOIN genres g ON g.code = b.genre
+            JOIN corpus_slots s ON s.code = b.slot_type
+            ON CONFLICT (genre_id, slot_id, word) DO NOTHING
+        )
+        SELECT COUNT(*), MAX(id::text) FROM batch
+    """, batch_size, sleep_seconds)
+
+
+def migrate(conn, batch_size: int = 1000, sleep_seconds: float = 0.1):
+    """二重書き込みを開始してから既存データをバックフィル"""
+    cur = conn.cursor()
+    swapped = is_swapped(cur)
+    conn.commit()
+    cur.close()
+    if swapped:
+        print("⚠️ corpus_words is already a view over corpus_words_compact")
+        return
+
+    print("🚚 Migrating corpus_words -> corpus_words_compact")
+    install_dual_write(conn, 'corpus_words', 'INSERT OR UPDATE OR DELETE')
+    copied = backfill(conn, batch_size, sleep_seconds)
+    print(f"✅ Backfill finished ({copied} rows). Run 'swap' next.")
+
+
+def swap(conn, lock_timeout_ms: int = 5000) -> bool:
+    """corpus_words を互換ビューに置き換え（旧テーブルは corpus_words_legacy として残す）"""
+    cur = conn.cursor()
+    swapped = is_swapped(cur)
+    conn.commit()
+    cur.close()
+    if swapped:
+        print("⚠️ corpus_words is already a view over corpus_words_compact")
+        return False
+
+    def replace(cur):
+        cur.execute(CORPUS_WORDS_VIEW)
+        cur.execute("""
+            CREATE TRIGGER corpus_words_write
+            INSTEAD OF INSERT OR UPDATE OR DELETE ON corpus_words
+            FOR EACH ROW EXECUTE FUNCTION corpus_words_view_write()
+        """)
+
+    return swap_table(conn, 'corpus_words', 'corpus_words_compact', replace, lock_timeout_ms)
+
+
+def show_status(conn):
+    """移行状態と、旧テーブル・compact テーブルのサイズを表示"""
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('corpus_words_compact') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        print("📊 corpus_words_compact: not initialized")
+        conn.commit()
+        cur.close()
+        return
+
+    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'dual_write_corpus_words'")
+    dual_write = cur.fetchone() is not None
+    state = 'swapped' if is_swapped(cur) else ('migrating' if dual_write else 'created')
+    print(f"📊 corpus_words: {state}")
+
+    for table in ('corpus_words', 'corpus_words_legacy', 'corpus_words_compact'):
+        cur.execute("""
+            SELECT c.reltuples::bigint, pg_table_size(c.oid), pg_indexes_size(c.oid)
+            FROM pg_class c WHERE c.relname = %s AND c.relkind = 'r'
+        """, (table,))
+        row = cur.fetchone()
+        if row:
+            rows, heap, indexes = row
+            print(f"  - {table}: ~{max(rows, 0)} rows, heap {heap / 1024:.0f} kB, "
+                  f"indexes {indexes / 1024:.0f} kB")
+    conn.commit()
+    cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist corpus_words の辞書エンコード版への移行')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('init', help='辞書テーブルと compact テーブルを作成')
+    sub.add_parser('status', help='状態を表示')
+
+    p = sub.add_parser('migrate', help='二重書き込みを開始してバックフィル')
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--sleep', type=float, default=0.1)
+
+    p = sub.add_parser('swap', help='corpus_words を互換ビューに置き換え')
+    p.add_argument('--lock-timeout-ms', type=int, default=5000)
+
+    args = parser.parse_args()
+
+    with open(args.conn_info, 'r') as f:
+        conn_info = json.load(f)
+
+    conn = connect(conn_info)
+    print(f"🔗 Connected to {conn_info['endpoint']}")
+
+    try:
+        if args.command == 'init':
+            apply_schema(conn)
+        elif args.command == 'status':
+            show_status(conn)
+        elif args.command == 'migrate':
+            migrate(conn, args.batch_size, args.sleep)
+        elif args.command == 'swap':
+            swap(conn, args.lock_timeout_ms)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+ステージング済みのシャードをまとめてコーパステーブルに一括投入
+
+aozora_to_corpus.py extract が書き出した作品ごとのシャード（corpus_staging.py）を読み、
+ジャンル未定作品の分類・フレーズ抽出・テンプレートの重複除去までを DB に接続せずに済ませてから、
+corpus_words / sentence_templates / phrase_patterns へ execute_values で1回のトランザクションで投入する。
+シャードは残るので、抽出をやり直さずに何度でも投入し直せる。
+
+使い方:
+  python corpus_loader.py --staging-dir corpus_staging
+  python corpus_loader.py --staging-dir corpus_staging --dry-run
+"""
+import argparse
+import json
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+from psycopg2.extras import execute_values
+
+from aozora_to_corpus import DEFAULT_STAGING_DIR, GENRE_KEYWORDS, extract_work
+from corpus_cache import bump_generation
+from corpus_compact import upsert_words
+from corpus_staging import iter_shards, read_text
+from db_utils import connect
+from genre_classifier import DEFAULT_MIN_CONFIDENCE, GenreClassifier
+from phrase_miner import mine_phrases
+from template_dedup import TemplateDeduplicator
+
+WORDS_PER_SLOT = 20
+TEMPLATES_PER_GENRE = 5
+PHRASES_PER_GENRE = 10
+# ジャンル未定作品の本文を一度に読み込む作品数
+CLASSIFY_BATCH = 200
+
+
+def merge_shards(staging_dir: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 review_path: str = 'genre_review.json') -> Dict[str, dict]:
+    """シャードをジャンル別にまとめる
+
+    戻り値: {genre: {'words': {slot_type: Counter}, 'templates': [クラスタ], 'phrases': [フレーズ]}}
+
+    本文はメモリに溜めず、分類器の学習・フレーズ抽出のたびにステージングから読み直す。
+    """
+    genre_data = defaultdict(lambda: {
+        'words': defaultdict(Counter),
+        'templates': [],
+        'phrases': []
+    })
+    # フレーズ抽出・分類器の学習に使う作品ID（本文は genre_texts() で遅延読み込み）
+    genre_works = defaultdict(list)
+    # 助詞・句読点だけが違うテンプレートをジャンルごとにまとめる
+    template_dedup = TemplateDeduplicator()
+
+    def read_work(work_id: str) -> str:
+        return read_text(staging_dir, work_id, provenance[work_id]['text_sha256'])
+
+    def genre_texts() -> Dict[str, Iterator[str]]:
+        """ジャンル -> 本文を1作品ずつ読むジェネレータ（1回しか走査できない）"""
+        return {genre: (read_work(work_id) for work_id in work_ids)
+                for genre, work_ids in genre_works.items()}
+
+    def add_work(genre: str, work_id: str, words: dict, templates: List[str], phrases: List[str]):
+        for slot_type, counts in words.items():
+            genre_data[genre]['words'][slot_type].update(counts)
+        for template in templates:
+            template_dedup.add(template, (genre,))
+        genre_data[genre]['phrases'].extend(phrases)
+        genre_works[genre].append(work_id)
+
+    unlabeled = []
+    provenance = {}
+    for shard in iter_shards(staging_dir):
+        meta = shard['provenance']
+        provenance[meta['work_id']] = meta
+        if meta['genre'] is None:
+            unlabeled.append(meta['work_id'])
+        else:
+            add_work(meta['genre'], meta['work_id'], shard['words'], shard['templates'], shard['phrases'])
+    print(f"📦 Merged {len(provenance)} shards ({len(unlabeled)} unlabeled)")
+
+    # ジャンル未定の作品を分類し、確信度の低い作品はレビューリストに回す
+    if unlabeled and genre_works:
+        print(f"\n🏷️ Classifying {len(unlabeled)} unlabeled works...")
+        classifier = GenreClassifier(GENRE_KEYWORDS).fit(genre_texts())
+        accepted, review = [], []
+        for start in range(0, len(unlabeled), CLASSIFY_BATCH):
+            batch = unlabeled[start:start + CLASSIFY_BATCH]
+            batch_accepted, batch_review = classifier.classify(
+                [(work_id, read_work(work_id)) for work_id in batch], min_confidence)
+            accepted.extend(batch_accepted)
+            review.extend(batch_review)
+        for result in accepted:
+            text = read_work(result['work_id'])
+            print(f"  ✅ {provenance[result['work_id']]['title']}: "
+                  f"{result['genre']} ({result['confidence']:.0%})")
+            add_work(result['genre'], result['work_id'], *extract_work(text, result['genre']))
+        if review:
+            for result in review:
+                meta = provenance[result['work_id']]
+                result['title'], result['author'] = meta['title'], meta['author']
+                print(f"  📝 {result['title']}: {result['genre']}? ({result['confidence']:.0%}) -> review")
+            with open(review_path, 'w', encoding='utf-8') as f:
+                json.dump(review, f, ensure_ascii=False, indent=2)
+            print(f"  📝 {len(review)} works written to {review_path} (not ingested)")
+
+    # 接尾辞配列でジャンル特有のフレーズを抽出し、固定フレーズより優先する
+    print("\n🔎 Mining genre-specific phrases...")
+    for genre, mined in mine_phrases(genre_texts(), top=PHRASES_PER_GENRE).items():
+        genre_data[genre]['phrases'] = [phrase for phrase, _, _ in mined] + genre_data[genre]['phrases']
+        print(f"  ✅ {genre}: {', '.join(phrase for phrase, _, _ in mined[:5])}")
+
+    # テンプレートのクラスタ（重みの降順）をジャンル別に振り分け
+    for cluster in template_dedup.clusters():
+        genre_data[cluster['namespace'][0]]['templates'].append(cluster)
+    stats = template_dedup.stats()
+    print(f"\n🧩 Templates: {stats['distinct_templates']} distinct -> {stats['clusters']} clusters "
+          f"({stats['merged_clusters']} merged, largest {stats['largest_cluster']})")
+
+    return genre_data
+
+
+def build_rows(genre_data: Dict[str, dict]) -> Dict[str, List[Tuple]]:
+    """ジャンル別の集計を各テーブルの行にする
+
+    1つの INSERT ... ON CONFLICT DO UPDATE で同じ行を2回更新できないため、
+    テーブルの一意キーごとに1行にまとめる。
+    """
+    words = {}
+    templates = {}
+    phrases = {}
+
+    for genre, data in sorted(genre_data.items()):
+        # 各スロット上位20語
+        for slot_type, counts in data['words'].items():
+            for word, count in counts.most_common(WORDS_PER_SLOT):
+                words[(genre, slot_type, word)] = min(1.0, count / 10.0)
+
+        # クラスタ代表の上位5個、出現回数はそのまま frequency に、
+        # ジャンル内で最大のクラスタを1.0とした相対値を重みに
+        clusters = [c for c in data['templates'][:TEMPLATES_PER_GENRE] if c['template']]
+        top = max((c['weight'] for c in clusters), default=1)
+        for cluster in clusters:
+            weight = round(cluster['weight'] / top, 2)
+            key = ('auto_extracted', cluster['template'])
+            if key not in templates or templates[key][2] < cluster['weight']:
+                templates[key] = (genre, weight, cluster['weight'])
+
+        # 順序を保って重複除去し上位10個
+        for phrase in list(dict.fromkeys(data['phrases']))[:PHRASES_PER_GENRE]:
+            if phrase:
+                phrases[(genre, phrase)] = True
+
+    return {
+        'corpus_words': [
+            (genre, slot_type, word, weight)
+            for (genre, slot_type, word), weight in words.items()
+        ],
+        'sentence_templates': [
+            (str(uuid.uuid4()), template_type, template, genre, weight, frequency)
+            for (template_type, template), (genre, weight, frequency) in templates.items()
+        ],
+        'phrase_patterns': [
+            (str(uuid.uuid4()), genre, phrase)
+            for genre, phrase in phrases
+        ],
+    }
+
+
+def bulk_load(conn, rows: Dict[str, List[Tuple]], page_size: int = 500):
+    """build_rows の結果を1トランザクションで投入し、コーパスの世代を進める"""
+    cur = conn.cursor()
+    try:
+        upsert_words(cur, rows['corpus_words'], keep_max=True, page_size=page_size)
+
+        execute_values(cur, """
+            INSERT INTO sentence_templates (id, template_type, template, genre, weight, frequency)
+            VALUES %s
+            ON CONFLICT (template_type, template)
+            DO UPDATE SET weight = GREATEST(sentence_templates.weight, EXCLUDED.weight),
+                          frequency = GREATEST(sentence_templates.frequency, EXCLUDED.frequency)
+        """, rows['sentence_templates'], page_size=page_size)
+
+        execute_values(cur, """
+            INSERT INTO phrase_patterns (id, genre, phrase)
+            VALUES %s
+            ON CONFLICT (genre, phrase) DO NOTHING
+        """, rows['phrase_patterns'], page_size=page_size)
+
+        genres = ({row[0] for row in rows['corpus_words']}
+                  | {row[3] for row in rows['sentence_templates']}
+                  | {row[1] for row in rows['phrase_patterns']})
+        generation = bump_generation(cur, genres, 'corpus_loader')
+
+        conn.commit()
+        if generation is not None:
+            print(f"🔔 Corpus generation {generation}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def print_stats(conn):
+    cur = conn.cursor()
+    print("\n" + "=" * 60)
+    print("📊 投入結果:")
+
+    cur.execute("SELECT genre, COUNT(*) FROM corpus_words GROUP BY genre")
+    for row in cur.fetchall():
+        print(f"  corpus_words ({row[0]}): {row[1]} entries")
+
+    cur.execute("SELECT genre, COUNT(*) FROM sentence_templates WHERE genre IS NOT NULL GROUP BY genre")
+    for row in cur.fetchall():
+        print(f"  templates ({row[0]}): {row[1]} entries")
+
+    cur.execute("SELECT genre, COUNT(*) FROM phrase_patterns GROUP BY genre")
+    for row in cur.fetchall():
+        print(f"  phrases ({row[0]}): {row[1]} entries")
+
+    cur.close()
+
+
+def load_staging(conn_info: dict, staging_dir: str = DEFAULT_STAGING_DIR,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE, dry_run: bool = False):
+    """シャードをまとめて投入（DBへの接続は集計が終わってから）"""
+    genre_data = merge_shards(staging_dir, min_confidence)
+    rows = build_rows(genre_data)
+
+    print("\n" + "=" * 60)
+    print(f"📦 {len(rows['corpus_words'])} words, {len(rows['sentence_templates'])} templates, "
+          f"{len(rows['phrase_patterns'])} phrases")
+    if dry_run:
+        print("🔍 Dry run: nothing written")
+        return rows
+
+    conn = connect(conn_info)
+    try:
+        bulk_load(conn, rows)
+        print_stats(conn)
+    finally:
+        conn.close()
+
+    print("\n✅ 青空文庫コーパスデータの投入完了！")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ステージング済みシャードをコーパステーブルに一括投入')
+    parser.add_argument('--staging-dir', default=DEFAULT_STAGING_DIR)
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help='ジャンル未定作品を採用する分類の確信度')
+    parser.add_argument('--dry-run', action='store_true', help='集計だけ行いDBには書かない')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    args = parser.parse_args()
+
+    conn_info = None
+    if not args.dry_run:
+        with open(args.conn_info, 'r') as f:
+            conn_info = json.load(f)
+
+    load_staging(conn_info, args.staging_dir, args.min_confidence, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
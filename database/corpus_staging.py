@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+コーパス抽出結果のステージング（作品ごとのシャード）
+
+抽出（ダウンロード・前処理・単語/テンプレート/フレーズ抽出）と DB 投入を分けるため、
+抽出結果は作品ごとにローカルのステージングディレクトリへ書き出す。
+投入は corpus_loader.py がシャードをまとめて短いトランザクション1回で行う。
+
+ディレクトリ構成:
+  {staging_dir}/index.jsonl            1行1シャード（後に書かれた行が優先）
+  {staging_dir}/shards/{work_id}.jsonl  抽出結果
+  {staging_dir}/texts/{work_id}.txt     前処理済み本文（フレーズ抽出・ジャンル分類の再実行用）
+
+シャードは1行1レコードの JSONL:
+  {"type": "provenance", "work_id", "title", "author", "genre", "chars", "text_sha256", ...}
+  {"type": "words", "slot_type", "counts": {単語: 回数}}
+  {"type": "template", "template"}
+  {"type": "phrase", "phrase"}
+
+シャードと本文は一時ファイルに書いてから rename し、書き終わってから
+index.jsonl に1行追記する。途中で落ちた作品は索引に載らないので、
+再実行すれば未完了の作品だけが抽出し直される。
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+SHARD_VERSION = 1
+INDEX_FILE = 'index.jsonl'
+SHARD_DIR = 'shards'
+TEXT_DIR = 'texts'
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shard_path(staging_dir: str, work_id: str) -> str:
+    return os.path.join(staging_dir, SHARD_DIR, f"{work_id}.jsonl")
+
+
+def text_path(staging_dir: str, work_id: str) -> str:
+    return os.path.join(staging_dir, TEXT_DIR, f"{work_id}.txt")
+
+
+def write_shard(staging_dir: str, work_id: str, title: str, author: str,
+                genre: Optional[str], text: str, words: Dict[str, Dict[str, int]],
+                templates: List[str], phrases: List[str]) -> dict:
+    """1作品の抽出結果をシャードとして書き出し、索引に追記した行を返す
+
+    genre が None の作品は本文だけを保存し、抽出は投入時の分類後に行う。
+    """
+    os.makedirs(os.path.join(staging_dir, SHARD_DIR), exist_ok=True)
+    os.makedirs(os.path.join(staging_dir, TEXT_DIR), exist_ok=True)
+
+    text_bytes = text.encode('utf-8')
+    _atomic_write(text_path(staging_dir, work_id), text_bytes)
+
+    extracted_at = datetime.now(timezone.utc).isoformat()
+    records = [{
+        'type': 'provenance',
+        'version': SHARD_VERSION,
+        'work_id': work_id,
+        'title': title,
+        'author': author,
+        'genre': genre,
+        'chars': len(text),
+        'text_sha256': _sha256(text_bytes),
+        'extracted_at': extracted_at,
+    }]
+    for slot_type, counts in words.items():
+        if counts:
+            records.append({'type': 'words', 'slot_type': slot_type, 'counts': counts})
+    records.extend({'type': 'template', 'template': t} for t in templates)
+    records.extend({'type': 'phrase', 'phrase': p} for p in phrases)
+
+    shard_bytes = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+    _atomic_write(shard_path(staging_dir, work_id), shard_bytes)
+
+    entry = {
+        'work_id': work_id,
+        'genre': genre,
+        'shard': os.path.join(SHARD_DIR, f"{work_id}.jsonl"),
+        'sha256': _sha256(shard_bytes),
+        'words': sum(sum(c.values()) for c in words.values()),
+        'templates': len(templates),
+        'phrases': len(phrases),
+        'extracted_at': extracted_at,
+    }
+    # 1行を1回の write で追記する（複数プロセスから並行に抽出しても行が混ざらない）
+    line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+    fd = os.open(os.path.join(staging_dir, INDEX_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+    return entry
+
+
+def read_index(staging_dir: str) -> Dict[str, dict]:
+    """作品ID -> 索引の行（同じ作品が複数回抽出された場合は最後の行）"""
+    index = {}
+    path = os.path.join(staging_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return index
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                index[entry['work_id']] = entry
+    return index
+
+
+def read_text(staging_dir: str, work_id: str, text_sha256: Optional[str] = None) -> str:
+    """前処理済み本文を読む（text_sha256 を渡せばチェックサムを検証する）"""
+    with open(text_path(staging_dir, work_id), 'rb') as f:
+        text_bytes = f.read()
+    if text_sha256 is not None and _sha256(text_bytes) != text_sha256:
+        raise ValueError(f"checksum mismatch for text of work {work_id}")
+    return text_bytes.decode('utf-8')
+
+
+def read_shard(staging_dir: str, entry: dict, with_text: bool = False) -> dict:
+    """索引の行に対応するシャードを読み、チェックサムを検証して返す
+
+    戻り値: {'provenance', 'words': {slot_type: {word: count}}, 'templates', 'phrases'}
+    本文は大きいので with_text=True のときだけ 'text' に読み込む
+    （読み込まない場合もチェックサムは検証する）。
+    """
+    with open(os.path.join(staging_dir, entry['shard']), 'rb') as f:
+        shard_bytes = f.read()
+    if _sha256(shard_bytes) != entry['sha256']:
+        raise ValueError(f"checksum mismatch for shard {entry['shard']}")
+
+    shard = {'provenance': None, 'words': {}, 'templates': [], 'phrases': []}
+    for line in shard_bytes.decode('utf-8').splitlines():
+        record = json.loads(line)
+        kind = record['type']
+        if kind == 'provenance':
+            shard['provenance'] = record
+        elif kind == 'words':
+            shard['words'][record['slot_type']] = record['counts']
+        elif kind == 'template':
+            shard['templates'].append(record['template'])
+        elif kind == 'phrase':
+            shard['phrases'].append(record['phrase'])
+
+    text_sha256 = shard['provenance']['text_sha256']
+    if with_text:
+        shard['text'] = read_text(staging_dir, entry['work_id'], text_sha256)
+    elif _file_sha256(text_path(staging_dir, entry['work_id'])) != text_sha256:
+        raise ValueError(f"checksum mismatch for text of work {entry['work_id']}")
+    return shard
+
+
+def iter_shards(staging_dir: str, with_text: bool = False) -> Iterator[dict]:
+    """索引に載っている全シャードを作品ID順に返す（壊れたシャードは警告して飛ばす）"""
+    for work_id, entry in sorted(read_index(staging_dir).items()):
+        try:
+            yield read_shard(staging_dir, entry, with_text)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping shard for work {work_id}: {e}")
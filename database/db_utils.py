@@ -0,0 +1,127 @@
+"""
+database/ 以下のツールで共通の PostgreSQL ヘルパー
+
+  connect            rds_connection_info.json の内容で接続
+  apply_sql_file     SQLファイルをまとめて適用
+  install_dual_write 移行元テーブルに二重書き込みトリガーを設定
+  keyset_backfill    id のキーセット順にバッチでコピー
+  swap_table         件数を確認してから短いロックで旧テーブルを {table}_legacy に改名
+
+partition_manager.py（履歴テーブルのパーティション化）と corpus_compact.py
+（corpus_words の辞書エンコード）は、どちらも
+二重書き込み → バックフィル → 入れ替え の手順でオンライン移行する。
+"""
+import time
+from typing import Callable
+
+import psycopg2
+
+ZERO_UUID = '00000000-0000-0000-0000-000000000000'
+
+
+def connect(conn_info: dict):
+    """rds_connection_info.json の内容でPostgreSQLに接続"""
+    return psycopg2.connect(
+        host=conn_info['endpoint'],
+        port=conn_info['port'],
+        database=conn_info['database'],
+        user=conn_info['username'],
+        password=conn_info['password']
+    )
+
+
+def apply_sql_file(conn, path: str):
+    """SQLファイルを1回の execute で適用してコミット
+
+    apply_schema.py は ';' で文を分割して実行するが、
+    plpgsql の関数本体に ';' が含まれるファイルはそのままでは分割できない。
+    """
+    with open(path, 'r') as f:
+        schema_sql = f.read()
+
+    cur = conn.cursor()
+    cur.execute(schema_sql)
+    conn.commit()
+    cur.close()
+    print(f"✅ Applied {path}")
+
+
+def install_dual_write(conn, table: str, events: str = 'INSERT OR DELETE'):
+    """移行元テーブルに dual_write_{table}() を呼ぶトリガーを設定
+
+    トリガー設定後の変更は移行先にも反映されるため、
+    以降はトリガー設定前の行だけをバックフィルすればよい。
+    """
+    cur = conn.cursor()
+    cur.execute(f"DROP TRIGGER IF EXISTS dual_write_{table} ON {table}")
+    cur.execute(f"""
+        CREATE TRIGGER dual_write_{table}
+        AFTER {events} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION dual_write_{table}()
+    """)
+    conn.commit()
+    cur.close()
+    print(f"  🔀 Dual-write trigger installed on {table}")
+
+
+def keyset_backfill(conn, label: str, batch_sql: str, batch_size: int = 1000,
+                    sleep_seconds: float = 0.1) -> int:
+    """UUID の id のキーセット順にバッチでコピーし、コピーした行数を返す
+
+    batch_sql は (前回の最後の id, バッチサイズ) を受け取り、
+    (走査した行数, 走査した最大の id::text) を1行で返すクエリ。
+    移行先への INSERT は ON CONFLICT DO NOTHING にしておけば、
+    二重書き込み済みの行や中断後の再実行で重複しても問題ない。
+    バッチの SELECT は行をロックすること（FOR KEY SHARE など）。ロックしないと、
+    スナップショット取得後に削除された行をコピーしてしまい、件数が一致しなくなる。
+    """
+    cur = conn.cursor()
+    last_id = ZERO_UUID
+    copied = 0
+    started = time.monotonic()
+
+    while True:
+        cur.execute(batch_sql, (last_id, batch_size))
+        scanned, max_id = cur.fetchone()
+        conn.commit()
+
+        if scanned == 0:
+            break
+
+        copied += scanned
+        last_id = max_id
+        print(f"    📦 {label}: {copied} rows copied ({time.monotonic() - started:.1f}s)")
+
+        if scanned < batch_size:
+            break
+        time.sleep(sleep_seconds)
+
+    cur.close()
+    return copied
+
+
+def swap_table(conn, table: str, target: str, replace: Callable, lock_timeout_ms: int = 5000) -> bool:
+    """移行元と移行先の行数が一致していれば、短いトランザクションで入れ替える
+
+    二重書き込みトリガーを外して移行元を {table}_legacy に改名した後、
+    replace(cur) で table という名前の移行先（改名・ビュー作成など）を用意する。
+    """
+    cur = conn.cursor()
+    cur.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT COUNT(*) FROM {target})")
+    old_count, new_count = cur.fetchone()
+    conn.commit()
+    if old_count != new_count:
+        print(f"❌ Row count mismatch: {table}={old_count}, {target}={new_count}. Run migrate again.")
+        cur.close()
+        return False
+
+    cur.execute("SET LOCAL lock_timeout = %s", (f"{lock_timeout_ms}ms",))
+    cur.execute(f"LOCK TABLE {table}, {target} IN ACCESS EXCLUSIVE MODE")
+    cur.execute(f"DROP TRIGGER IF EXISTS dual_write_{table} ON {table}")
+    cur.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    replace(cur)
+    conn.commit()
+    cur.close()
+
+    print(f"✅ Swapped {table} ({new_count} rows). Old table kept as {table}_legacy.")
+    return True
@@ -6,6 +6,9 @@ import psycopg2
 import json
 import uuid
 
+from corpus_cache import bump_generation
+from corpus_compact import upsert_words
+
 def insert_initial_corpus():
     # 接続情報を読み込み
     with open('rds_connection_info.json', 'r') as f:
@@ -182,12 +185,7 @@ def insert_initial_corpus():
     ]
     
     print("\n📦 Inserting corpus_words...")
-    for genre, slot_type, word, weight in corpus_words:
-        cur.execute("""
-            INSERT INTO corpus_words (id, genre, slot_type, word, weight)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (genre, slot_type, word) DO NOTHING
-        """, (str(uuid.uuid4()), genre, slot_type, word, weight))
+    upsert_words(cur, corpus_words, keep_max=False)
     print(f"  ✅ Inserted {len(corpus_words)} words")
     
     # 2. sentence_templates の初期データ
@@ -282,6 +280,14 @@ def insert_initial_corpus():
             """, (str(uuid.uuid4()), room_name, 0))
     print(f"  ✅ Inserted {len(initial_rooms)} rooms")
     
+    # コーパスの世代を進める（コミット時に corpus_changed が通知される）
+    genres = ({genre for genre, _, _, _ in corpus_words}
+              | {genre for _, _, genre in sentence_templates}
+              | {genre for genre, _ in phrase_patterns})
+    generation = bump_generation(cur, genres, 'insert_initial_corpus')
+    if generation is not None:
+        print(f"\n🔔 Corpus generation {generation}")
+    
     # コミット
     conn.commit()
     
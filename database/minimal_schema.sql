@@ -70,6 +70,8 @@ CREATE TABLE IF NOT EXISTS mutations (
 );
 
 CREATE INDEX idx_mutations_room ON mutations(room_id, created_at DESC);
+-- retention_worker.py のキーセットページング (generation_after, id) 用
+CREATE INDEX IF NOT EXISTS idx_mutations_room_generation ON mutations(room_id, generation_after, id);
 
 -- ========================================
 -- 5. コーパステーブル（単語辞書）
@@ -85,6 +87,7 @@ CREATE TABLE IF NOT EXISTS corpus_words (
 );
 
 CREATE INDEX idx_corpus_words_lookup ON corpus_words(genre, slot_type);
+-- ジャンル・スロットを smallint に辞書エンコードした版は 08_compact_corpus.sql（corpus_compact.py で移行）
 
 -- ========================================
 -- 6. 文テンプレートテーブル
@@ -94,10 +97,16 @@ CREATE TABLE IF NOT EXISTS sentence_templates (
     template_type VARCHAR(50) NOT NULL, -- '発見', '感情', '行動', '描写'
     template TEXT NOT NULL, -- '{主体}は{場所}で{発見物}を見つけた。'
     genre VARCHAR(20), -- オプショナル：特定ジャンル用
+    weight DECIMAL(3,2) DEFAULT 1.0, -- ジャンル内で最大のクラスタを1.0とした相対頻度
+    frequency INTEGER DEFAULT 1, -- 近似重複をまとめたクラスタの出現回数
     
     UNIQUE(template_type, template)
 );
 
+-- 既存環境向け
+ALTER TABLE sentence_templates ADD COLUMN IF NOT EXISTS weight DECIMAL(3,2) DEFAULT 1.0;
+ALTER TABLE sentence_templates ADD COLUMN IF NOT EXISTS frequency INTEGER DEFAULT 1;
+
 -- ========================================
 -- 7. フレーズパターンテーブル
 -- ========================================
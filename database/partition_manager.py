@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+履歴テーブルのパーティション管理ツール
+
+05_partitioned_history.sql で定義したパーティション版テーブルへの移行と運用を行う。
+
+  init          05_partitioned_history.sql を適用
+  create-future mutations の月次パーティションを先行作成
+  migrate       二重書き込みトリガーを設定し、既存データをバッチでバックフィル
+  swap          バックフィル完了後に既存テーブルとパーティション版を入れ替え
+  drop-expired  保持期間を過ぎた mutations の月次パーティションをDROP
+  status        各テーブルの状態を表示
+
+使い方:
+  python partition_manager.py init
+  python partition_manager.py migrate --table genomes --batch-size 1000
+  python partition_manager.py swap --table genomes
+  python partition_manager.py create-future --months 3
+  python partition_manager.py drop-expired --keep-days 30
+"""
+import argparse
+import json
+import re
+from datetime import date
+
+from db_utils import apply_sql_file, connect, install_dual_write, keyset_backfill, swap_table
+
+SCHEMA_FILE = '05_partitioned_history.sql'
+
+# 移行対象テーブル -> バックフィル時に SELECT する列
+# mutations の created_at はパーティションキーなので NULL を補完する
+PARTITIONED_TABLES = {
+    'genomes': 'id, room_id, generation, genome_data, mutation_count, created_at',
+    'texts': 'id, room_id, generation, content, created_at',
+    'mutations': ('id, room_id, operator, actor, generation_before, generation_after, '
+                  'text_preview, COALESCE(created_at, CURRENT_TIMESTAMP)'),
+}
+
+# 月次パーティション名: mutations_p202610
+MONTHLY_PARTITION_RE = re.compile(r'^mutations_p(\d{4})(\d{2})$')
+
+# texts / genomes を参照するビュー（入れ替え後に新しいテーブルを参照し直す）
+CURRENT_ROOM_STATES_VIEW = """
+CREATE OR REPLACE VIEW current_room_states AS
+SELECT
+    r.id,
+    r.name,
+    r.current_generation,
+    t.content as current_text,
+    g.genome_data,
+    g.mutation_count,
+    r.updated_at
+FROM rooms r
+LEFT JOIN LATERAL (
+    SELECT * FROM texts
+    WHERE room_id = r.id
+    ORDER BY generation DESC
+    LIMIT 1
+) t ON true
+LEFT JOIN LATERAL (
+    SELECT * FROM genomes
+    WHERE room_id = r.id
+    ORDER BY generation DESC
+    LIMIT 1
+) g ON true
+"""
+
+
+def is_partitioned(cur, table: str) -> bool:
+    """テーブルがパーティション親テーブルかどうか"""
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p')", (table,))
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitioned_parent(cur, table: str) -> str:
+    """入れ替え前後どちらでもパーティション親テーブル名を返す"""
+    return table if is_partitioned(cur, table) else f"{table}_partitioned"
+
+
+def add_months(d: date, months: int) -> date:
+    """月初日に months か月を加算"""
+    month_index = d.year * 12 + (d.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def apply_schema(conn):
+    """パーティション版テーブルとトリガー関数を作成"""
+    apply_sql_file(conn, SCHEMA_FILE)
+
+
+def create_monthly_partitions(conn, start: date, end: date) -> int:
+    """start から end（を含む月）までの月次パーティションを作成
+
+    既定パーティションに該当期間の行が残っていると作成に失敗するため、
+    その月の行を一時的に退避してから作成し、親テーブル経由で戻す。
+    """
+    cur = conn.cursor()
+    parent = partitioned_parent(cur, 'mutations')
+    created = 0
+
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        name = f"mutations_p{month.year:04d}{month.month:02d}"
+        upper = add_months(month, 1)
+
+        cur.execute("SELECT 1 FROM pg_class WHERE relname = %s", (name,))
+        if cur.fetchone() is None:
+            cur.execute("""
+                CREATE TEMP TABLE moved_rows ON COMMIT DROP AS
+                SELECT * FROM mutations_default WHERE created_at >= %s AND created_at < %s
+            """, (month, upper))
+            cur.execute("DELETE FROM mutations_default WHERE created_at >= %s AND created_at < %s",
+                        (month, upper))
+            cur.execute(f"""
+                CREATE TABLE {name} PARTITION OF {parent}
+                FOR VALUES FROM (%s) TO (%s)
+            """, (month, upper))
+            cur.execute(f"INSERT INTO {parent} SELECT * FROM moved_rows")
+            moved = cur.rowcount
+            conn.commit()
+
+            created += 1
+            print(f"  📅 Created {name} [{month} .. {upper})"
+                  + (f", moved {moved} rows from default" if moved else ""))
+
+        month = upper
+
+    cur.close()
+    return created
+
+
+def create_future_partitions(conn, months_ahead: int = 3) -> int:
+    """今月から months_ahead か月先までの月次パーティションを先行作成"""
+    today = date.today()
+    created = create_monthly_partitions(conn, today, add_months(today, months_ahead))
+    print(f"✅ {created} monthly partitions created ({months_ahead} months ahead)")
+    return created
+
+
+def backfill(conn, table: str, batch_size: int = 1000, sleep_seconds: float = 0.1) -> int:
+    """既存テーブルの行を id のキーセット順にパーティション版へコピー
+
+    バッチの行は FOR KEY SHARE でロックする。スナップショット取得後にコミットされた
+    DELETE の行はコピーされず、コピー中の行への DELETE はコピーのコミットを待ってから
+    二重書き込みトリガーでパーティション版からも消える。
+    """
+    target = f"{table}_partitioned"
+    columns = PARTITIONED_TABLES[table]
+
+    if table == 'mutations':
+        # 既存データの期間をカバーする月次パーティションを先に作っておく
+        cur = conn.cursor()
+        cur.execute("SELECT MIN(created_at)::date FROM mutations")
+        oldest = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        if oldest:
+            create_monthly_partitions(conn, oldest, date.today())
+
+    return keyset_backfill(conn, table, f"""
+        WITH batch AS (
+            SELECT {columns} FROM {table}
+            WHERE id > %s::uuid
+            ORDER BY id
+            LIMIT %s
+            FOR KEY SHARE
+        ), inserted AS (
+            INSERT INTO {target}
+            SELECT * FROM batch
+            ON CONFLICT DO NOTHING
+        )
+        SELECT COUNT(*), MAX(id::text) FROM batch
+    """, batch_size, sleep_seconds)
+
+
+def migrate(conn, table: str, batch_size: int = 1000, sleep_seconds: float = 0.1):
+    """二重書き込みを開始してから既存データをバックフィル"""
+    print(f"🚚 Migrating {table} -> {table}_partitioned")
+    install_dual_write(conn, table)
+    copied = backfill(conn, table, batch_size, sleep_seconds)
+    print(f"✅ Backfill of {table} finished ({copied} rows). Run 'swap --table {table}' next.")
+
+
+def move_room_heads_trigger(cur, table: str):
+    """room_heads の同期トリガー（06_room_heads.sql）を新しいテーブルに付け替え"""
+    cur.execute("SELECT 1 FROM pg_proc WHERE proname = %s", (f"sync_room_head_from_{table}",))
+    if cur.fetchone() is None:
+        return
+
+    cur.execute(f"DROP TRIGGER IF EXISTS room_heads_sync ON {table}_legacy")
+    cur.execute(f"""
+        CREATE TRIGGER room_heads_sync
+        AFTER INSERT OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION sync_room_head_from_{table}()
+    """)
+
+
+def swap(conn, table: str, lock_timeout_ms: int = 5000):
+    """既存テーブルとパーティション版を入れ替え（旧テーブルは {table}_legacy として残す）"""
+    cur = conn.cursor()
+    partitioned = is_partitioned(cur, table)
+    conn.commit()
+    cur.close()
+    if partitioned:
+        print(f"⚠️ {table} is already partitioned")
+        return False
+
+    def replace(cur):
+        cur.execute(f"ALTER TABLE {table}_partitioned RENAME TO {table}")
+        if table in ('genomes', 'texts'):
+            cur.execute(CURRENT_ROOM_STATES_VIEW)
+            move_room_heads_trigger(cur, table)
+
+    return swap_table(conn, table, f"{table}_partitioned", replace, lock_timeout_ms)
+
+
+def drop_expired_partitions(conn, keep_days: int = 30, lock_timeout_ms: int = 2000) -> int:
+    """保持期間を完全に過ぎた mutations の月次パーティションをDROP
+
+    パーティション単位で削除するため、行ごとの DELETE やVACUUMは不要。
+    """
+    cur = conn.cursor()
+    parent = partitioned_parent(cur, 'mutations')
+    cur.execute("SELECT (CURRENT_DATE - %s)::date", (keep_days,))
+    cutoff = cur.fetchone()[0]
+
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s
+        ORDER BY c.relname
+    """, (parent,))
+    partitions = [row[0] for row in cur.fetchall()]
+    conn.commit()
+
+    dropped = 0
+    for name in partitions:
+        match = MONTHLY_PARTITION_RE.match(name)
+        if not match:
+            continue
+        upper = add_months(date(int(match.group(1)), int(match.group(2)), 1), 1)
+        if upper > cutoff:
+            continue
+
+        cur.execute("SET LOCAL lock_timeout = %s", (f"{lock_timeout_ms}ms",))
+        cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        dropped += 1
+        print(f"  🗑️ Dropped {name} (ended {upper})")
+
+    cur.close()
+    print(f"✅ {dropped} expired partitions dropped (keep {keep_days} days)")
+    return dropped
+
+
+def show_status(conn):
+    """各テーブルのパーティション化状況と行数を表示"""
+    cur = conn.cursor()
+    print("📊 Partition status:")
+    for table in PARTITIONED_TABLES:
+        parent = partitioned_parent(cur, table)
+        cur.execute("SELECT 1 FROM pg_class WHERE relname = %s", (parent,))
+        if cur.fetchone() is None:
+            print(f"  - {table}: not initialized")
+            continue
+
+        cur.execute("""
+            SELECT c.relname, c.reltuples::bigint FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s
+            ORDER BY c.relname
+        """, (parent,))
+        partitions = cur.fetchall()
+        cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s", (f"dual_write_{table}",))
+        dual_write = cur.fetchone() is not None
+
+        state = 'swapped' if parent == table else ('migrating' if dual_write else 'created')
+        print(f"  - {table}: {state}, {len(partitions)} partitions")
+        for name, estimated_rows in partitions:
+            print(f"      {name}: ~{max(estimated_rows, 0)} rows")
+    conn.commit()
+    cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist 履歴テーブルのパーティション管理')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('init', help='パーティション版テーブルを作成')
+    sub.add_parser('status', help='状態を表示')
+
+    p = sub.add_parser('create-future', help='mutations の月次パーティションを先行作成')
+    p.add_argument('--months', type=int, default=3)
+
+    p = sub.add_parser('migrate', help='二重書き込みを開始してバックフィル')
+    p.add_argument('--table', choices=list(PARTITIONED_TABLES), required=True)
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--sleep', type=float, default=0.1)
+
+    p = sub.add_parser('swap', help='パーティション版に入れ替え')
+    p.add_argument('--table', choices=list(PARTITIONED_TABLES), required=True)
+    p.add_argument('--lock-timeout-ms', type=int, default=5000)
+
+    p = sub.add_parser('drop-expired', help='期限切れの月次パーティションをDROP')
+    p.add_argument('--keep-days', type=int, default=30)
+
+    args = parser.parse_args()
+
+    with open(args.conn_info, 'r') as f:
+        conn_info = json.load(f)
+
+    conn = connect(conn_info)
+    print(f"🔗 Connected to {conn_info['endpoint']}")
+
+    try:
+        if args.command == 'init':
+            apply_schema(conn)
+            create_future_partitions(conn)
+        elif args.command == 'status':
+            show_status(conn)
+        elif args.command == 'create-future':
+            create_future_partitions(conn, args.months)
+        elif args.command == 'migrate':
+            migrate(conn, args.table, args.batch_size, args.sleep)
+        elif args.command == 'swap':
+            swap(conn, args.table, args.lock_timeout_ms)
+        elif args.command == 'drop-expired':
+            drop_expired_partitions(conn, args.keep_days)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+接尾辞配列によるジャンル特有フレーズの抽出
+
+extract_phrases はジャンルごとに固定の数語が本文に含まれるかを見るだけなので、
+phrase_patterns がコーパスから新しいフレーズを学習することはない。
+ここでは前処理済みテキストを連結して接尾辞配列とLCP配列を作り、
+頻出する文字n-gramをジャンルごとに数え、他ジャンルとの比で特異度を付ける。
+
+  - 接尾辞配列: ダブリング法（ランク配列のペアを整数キーにして argsort）
+    n-gram の列挙には先頭 max_len 文字の順序だけが必要なので、
+    ダブリングは max_len に達した時点で打ち切る（O(n log max_len)）
+  - LCP配列: ダブリングの各段のランク配列を使ったバイナリリフティングで、
+    隣接する接尾辞の共通接頭辞長を max_len を上限にまとめて求める
+  - 句読点・改行は区切りとして扱い、区切りをまたぐ n-gram は数えない
+  - コーパスは chunk_chars 文字ずつのチャンクで処理し、ジャンルごとの候補数は
+    max_candidates を超えたら低頻度側から間引く（メモリ使用量が一定）
+
+使い方:
+  python phrase_miner.py --input-dir corpus_texts --top 20 --output mined_phrases.json
+  python phrase_miner.py --input-dir corpus_texts --insert   # phrase_patterns に投入
+
+  corpus_texts/{genre}/*.txt に前処理済みテキストを置く
+
+必要なパッケージ:
+  pip install numpy
+  pip install psycopg2-binary  # --insert のみ
+"""
+import argparse
+import json
+import math
+import os
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+# n-gram の区切りとして扱う文字
+SEPARATORS = set('。、，．！？!?「」『』（）()［］[]《》〈〉【】…―─・：；:;"\'　 \t\r\n')
+
+DEFAULT_MIN_LEN = 2
+DEFAULT_MAX_LEN = 8
+DEFAULT_MIN_COUNT = 3
+DEFAULT_CHUNK_CHARS = 1_000_000
+DEFAULT_MAX_CANDIDATES = 200_000
+
+
+def encode_text(text: str) -> np.ndarray:
+    """テキストをコードポイント配列に変換（区切り文字は0）"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    separator_codes = np.array(sorted(ord(c) for c in SEPARATORS), dtype=np.int64)
+    codes[np.isin(codes, separator_codes)] = 0
+    return codes
+
+
+def separator_span(codes: np.ndarray) -> np.ndarray:
+    """各位置から次の区切り文字（または末尾）までの文字数"""
+    n = len(codes)
+    separator_positions = np.nonzero(codes == 0)[0]
+    next_separator = np.append(separator_positions, n)[
+        np.searchsorted(separator_positions, np.arange(n))
+    ]
+    return next_separator - np.arange(n)
+
+
+def build_suffix_array(codes: np.ndarray, max_depth: int = None) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """ダブリング法で接尾辞配列を構築
+
+    戻り値は (接尾辞配列, ランク配列のリスト)。ranks[j] は各位置から 2**j 文字の
+    接頭辞の順位で、同じ接頭辞には同じ順位が付く（LCP計算に使う）。
+    max_depth を指定すると、先頭 max_depth 文字で整列した時点で打ち切る。
+    """
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), []
+
+    # 1文字の順位（0 = 区切り文字も通常の文字として順位を持つ）
+    _, rank = np.unique(codes, return_inverse=True)
+    rank = rank.astype(np.int64)
+    ranks = [rank]
+    sa = np.argsort(rank, kind='stable')
+
+    k = 1
+    while True:
+        if rank.max() == n - 1 or (max_depth is not None and k >= max_depth):
+            break
+
+        # (先頭 k 文字の順位, 続く k 文字の順位) を1つの整数キーにまとめる
+        # 末尾を越える位置は -1 として、短い接尾辞を先に並べる
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        key = rank * (n + 1) + (second + 1)
+
+        sa = np.argsort(key, kind='stable')
+        sorted_key = key[sa]
+        new_rank_sorted = np.concatenate(([0], np.cumsum(sorted_key[1:] != sorted_key[:-1])))
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = new_rank_sorted
+        ranks.append(rank)
+        k *= 2
+
+    return sa, ranks
+
+
+def build_lcp_array(codes: np.ndarray, sa: np.ndarray, ranks: List[np.ndarray],
+                    max_len: int) -> np.ndarray:
+    """隣接する接尾辞の共通接頭辞長（上限 max_len、区切り文字で打ち切り）
+
+    lcp[i] は sa[i-1] と sa[i] の共通接頭辞長。lcp[0] は0。
+    ランク配列が等しい 2**j 文字ブロックを大きい順に伸ばしていく。
+    """
+    n = len(sa)
+    lcp = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return lcp
+
+    a = sa[:-1]
+    b = sa[1:]
+    length = np.zeros(n - 1, dtype=np.int64)
+
+    for j in range(len(ranks) - 1, -1, -1):
+        step = 1 << j
+        rank = ranks[j]
+        pa = a + length
+        pb = b + length
+        # ブロック全体が末尾の内側にあり、ランクが一致すれば step 文字伸ばせる
+        ok = (length + step <= max_len) & (pa + step <= n) & (pb + step <= n)
+        idx = np.nonzero(ok)[0]
+        equal = rank[pa[idx]] == rank[pb[idx]]
+        length[idx[equal]] += step
+
+    # 区切り文字までの距離で打ち切る
+    span = separator_span(codes)
+    lcp[1:] = np.minimum(length, np.minimum(span[a], span[b]))
+    return lcp
+
+
+def count_ngrams(text: str, min_len: int = DEFAULT_MIN_LEN, max_len: int = DEFAULT_MAX_LEN,
+                 min_count: int = 2) -> Counter:
+    """テキスト中で min_count 回以上現れる文字n-gramを数える
+
+    LCP >= m で連続する接尾辞の区間が、同じ m-gram の出現位置の集合になる。
+    """
+    codes = encode_text(text)
+    sa, ranks = build_suffix_array(codes, max_depth=max_len)
+    lcp = build_lcp_array(codes, sa, ranks, max_len)
+    span = separator_span(codes)
+
+    counts = Counter()
+    for m in range(min_len, max_len + 1):
+        # LCP < m の位置で区間が切り替わる
+        starts = np.nonzero(lcp < m)[0]
+        sizes = np.diff(np.append(starts, len(sa)))
+        # 区切り文字・末尾までが m 文字未満の接尾辞は1つだけの区間になるので除く
+        frequent = (sizes >= min_count) & (span[sa[starts]] >= m)
+        for start, size in zip(starts[frequent], sizes[frequent]):
+            pos = sa[start]
+            counts[text[pos:pos + m]] += int(size)
+
+    return counts
+
+
+def iter_chunks(texts: Iterable[str], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """作品テキストを chunk_chars 文字程度のチャンクにまとめる
+
+    作品の境界には改行を挟むので、作品をまたぐ n-gram は数えない。
+    長い作品はチャンク境界で分割する。
+    """
+    buffer = []
+    size = 0
+    for text in texts:
+        for offset in range(0, len(text), chunk_chars):
+            piece = text[offset:offset + chunk_chars]
+            buffer.append(piece)
+            size += len(piece) + 1
+            if size >= chunk_chars:
+                yield '\n'.join(buffer)
+                buffer = []
+                size = 0
+    if buffer:
+        yield '\n'.join(buffer)
+
+
+def prune_counter(counts: Counter, max_candidates: int) -> Counter:
+    """候補数が上限を超えたら頻度上位の半分だけを残す"""
+    if len(counts) <= max_candidates:
+        return counts
+    return Counter(dict(counts.most_common(max_candidates // 2)))
+
+
+def overlap_length(a: str, b: str) -> int:
+    """2つのフレーズが重なる文字数（一方が他方を含む場合は短い方の長さ）"""
+    if a in b or b in a:
+        return min(len(a), len(b))
+    for k in range(min(len(a), len(b)) - 1, 0, -1):
+        if a.endswith(b[:k]) or b.endswith(a[:k]):
+            return k
+    return 0
+
+
+def score_phrases(genre_counts: Dict[str, Counter], genre_chars: Dict[str, int],
+                  min_count: int = DEFAULT_MIN_COUNT, top: int = 20,
+                  smoothing: float = 0.5,
+                  max_len: int = DEFAULT_MAX_LEN) -> Dict[str, List[Tuple[str, int, float]]]:
+    """ジャンル特異度でフレーズをスコア付け
+
+    スコア = log2(ジャンル内の出現率 / 他ジャンルでの出現率) * log2(1 + 出現回数)
+    より長いフレーズとほぼ同じ回数しか出ない部分文字列は除く（極大なフレーズだけを残す）。
+    max_len より長い繰り返しは1文字ずつずれた窓として何個も候補に残るので、
+    上位のフレーズと max_len - 1 文字以上重なる候補（包含を含む）は選ばない。
+    """
+    results = {}
+    total_counts = Counter()
+    for counts in genre_counts.values():
+        total_counts.update(counts)
+    total_chars = sum(genre_chars.values())
+
+    for genre, counts in genre_counts.items():
+        own_chars = max(genre_chars.get(genre, 0), 1)
+        other_chars = max(total_chars - genre_chars.get(genre, 0), 1)
+
+        # 1文字長いフレーズとほぼ同じ回数しか出ない部分文字列は、長い方に含めて除く
+        dominated = set()
+        for phrase, count in counts.items():
+            if count < min_count or len(phrase) < 2:
+                continue
+            for part in (phrase[:-1], phrase[1:]):
+                if count >= 0.9 * counts.get(part, 0):
+                    dominated.add(part)
+
+        scored = []
+        for phrase, count in counts.items():
+            if count < min_count or phrase in dominated:
+                continue
+            other = total_counts[phrase] - count
+            ratio = ((count + smoothing) / own_chars) / ((other + smoothing) / other_chars)
+            specificity = math.log2(ratio)
+            if specificity <= 0:
+                continue
+            scored.append((phrase, count, specificity * math.log2(1 + count)))
+
+        # 同じスコアなら長いフレーズを優先
+        scored.sort(key=lambda item: (item[2], len(item[0])), reverse=True)
+        selected = []
+        for item in scored:
+            if len(selected) >= top:
+                break
+            phrase = item[0]
+            if all(overlap_length(phrase, other) < min(max_len - 1, len(phrase), len(other))
+                   for other, _, _ in selected):
+                selected.append(item)
+        results[genre] = selected
+
+    return results
+
+
+def mine_phrases(texts_by_genre: Dict[str, Iterable[str]], top: int = 20,
+                 min_len: int = DEFAULT_MIN_LEN, max_len: int = DEFAULT_MAX_LEN,
+                 min_count: int = DEFAULT_MIN_COUNT, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                 max_candidates: int = DEFAULT_MAX_CANDIDATES) -> Dict[str, List[Tuple[str, int, float]]]:
+    """ジャンル別のテキスト列から特有フレーズの上位候補を抽出
+
+    texts_by_genre の値はイテレータでよく、チャンク単位で読み進める。
+    戻り値は ジャンル -> [(フレーズ, 出現回数, スコア), ...]
+    """
+    genre_counts = defaultdict(Counter)
+    genre_chars = defaultdict(int)
+
+    for genre, texts in texts_by_genre.items():
+        for chunk in iter_chunks(texts, chunk_chars):
+            genre_chars[genre] += len(chunk)
+            genre_counts[genre].update(count_ngrams(chunk, min_len, max_len))
+            genre_counts[genre] = prune_counter(genre_counts[genre], max_candidates)
+
+    return score_phrases(genre_counts, genre_chars, min_count, top, max_len=max_len)
+
+
+def iter_genre_files(input_dir: str) -> Dict[str, Iterator[str]]:
+    """{input_dir}/{genre}/*.txt を1ファイルずつ読むイテレータをジャンル別に返す"""
+    def read_files(genre_dir):
+        for filename in sorted(os.listdir(genre_dir)):
+            if filename.endswith('.txt'):
+                with open(os.path.join(genre_dir, filename), 'r', encoding='utf-8') as f:
+                    yield f.read()
+
+    return {
+        genre: read_files(os.path.join(input_dir, genre))
+        for genre in sorted(os.listdir(input_dir))
+        if os.path.isdir(os.path.join(input_dir, genre))
+    }
+
+
+def insert_phrases(conn, mined: Dict[str, List[Tuple[str, int, float]]]) -> int:
+    """抽出したフレーズを phrase_patterns に投入し、同じトランザクションでコーパスの世代を進める"""
+    from psycopg2.extras import execute_values
+
+    from corpus_cache import bump_generation
+
+    rows = [(str(uuid.uuid4()), genre, phrase)
+            for genre, phrases in mined.items()
+            for phrase, _, _ in phrases]
+    cur = conn.cursor()
+    try:
+        inserted = execute_values(cur, """
+            INSERT INTO phrase_patterns (id, genre, phrase)
+            VALUES %s
+            ON CONFLICT (genre, phrase) DO NOTHING
+            RETURNING 1
+        """, rows, fetch=True)
+        bump_generation(cur, mined.keys(), 'phrase_miner')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return len(inserted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接尾辞配列によるジャンル特有フレーズの抽出')
+    parser.add_argument('--input-dir', required=True,
+                        help='{genre}/*.txt 形式の前処理済みテキストのディレクトリ')
+    parser.add_argument('--top', type=int, default=20, help='ジャンルごとの候補数')
+    parser.add_argument('--min-len', type=int, default=DEFAULT_MIN_LEN)
+    parser.add_argument('--max-len', type=int, default=DEFAULT_MAX_LEN)
+    parser.add_argument('--min-count', type=int, default=DEFAULT_MIN_COUNT)
+    parser.add_argument('--chunk-chars', type=int, default=DEFAULT_CHUNK_CHARS)
+    parser.add_argument('--output', help='結果をJSONで保存するファイル')
+    parser.add_argument('--insert', action='store_true', help='phrase_patterns に投入する')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    args = parser.parse_args()
+
+    print(f"🔎 Mining phrases from {args.input_dir}...")
+    mined = mine_phrases(iter_genre_files(args.input_dir), args.top, args.min_len,
+                         args.max_len, args.min_count, args.chunk_chars)
+
+    for genre, phrases in mined.items():
+        print(f"\n🎨 Genre: {genre}")
+        for phrase, count, score in phrases:
+            print(f"  {phrase}  (count={count}, score={score:.2f})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({genre: [{'phrase': p, 'count': c, 'score': s} for p, c, s in phrases]
+                       for genre, phrases in mined.items()},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Saved to {args.output}")
+
+    if args.insert:
+        from db_utils import connect
+
+        with open(args.conn_info, 'r') as f:
+            conn_info = json.load(f)
+        conn = connect(conn_info)
+        inserted = insert_phrases(conn, mined)
+        conn.close()
+        print(f"\n✅ Inserted {inserted} phrases into phrase_patterns")
+
+
+if __name__ == "__main__":
+    main()
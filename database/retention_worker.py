@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+履歴テーブルの保持ポリシーを小さなバッチで適用するリテンションワーカー
+
+cleanup_old_data() のテキスト間引きは行ごとに相関サブクエリ (MAX(generation)) を
+評価し、巨大な DELETE 1文でロックとWALを抱え込む。このワーカーは
+ルームごとの世代カットオフを最初に一度だけ計算し、texts / genomes / mutations を
+キーセットページングで少しずつ削除する。バッチごとにコミットとスリープを挟むため
+ピーク時間帯でも実行できる。
+キーセットは texts / genomes が (room_id, generation)、mutations が
+idx_mutations_room_generation (room_id, generation_after, id) のインデックスで辿る。
+
+ポリシー（cleanup_old_data と同じ）:
+  - 最新世代から KEEP_RECENT_GENERATIONS 世代以内は全て保持
+  - それより古い世代は KEEP_EVERY 世代ごとに1つだけ保持
+
+使い方:
+  python retention_worker.py --batch-size 500 --sleep 0.2 --time-budget 300
+  python retention_worker.py --dry-run
+"""
+import argparse
+import json
+import time
+
+import psycopg2
+
+from db_utils import connect
+
+KEEP_RECENT_GENERATIONS = 1000
+KEEP_EVERY = 10
+
+# テーブル名 -> 世代カラム
+# mutations は世代カラムを持たないため generation_after を変異後の世代として扱う
+RETENTION_TABLES = {
+    'texts': 'generation',
+    'genomes': 'generation',
+    'mutations': 'generation_after',
+}
+
+# キーセットの開始位置（世代0は常に保持されるので -1 から始める）
+START_KEY = (-1, '00000000-0000-0000-0000-000000000000')
+
+
+def compute_cutoffs(cur, keep_recent: int = KEEP_RECENT_GENERATIONS) -> dict:
+    """ルームごとの世代カットオフを一度だけ計算
+
+    texts と genomes の最大世代はルームごとに LATERAL で
+    idx_texts_room_generation / idx_genomes_room_generation の先頭を1行ずつ読む
+    （GROUP BY で全行を集計しない）。rooms.current_generation と合わせた最大値から
+    カットオフを求める。
+    """
+    cur.execute("""
+        SELECT r.id,
+               GREATEST(COALESCE(r.current_generation, 0),
+                        COALESCE(t.generation, 0),
+                        COALESCE(g.generation, 0)) - %s AS cutoff
+        FROM rooms r
+        LEFT JOIN LATERAL (SELECT generation FROM texts WHERE room_id = r.id
+                           ORDER BY generation DESC LIMIT 1) t ON true
+        LEFT JOIN LATERAL (SELECT generation FROM genomes WHERE room_id = r.id
+                           ORDER BY generation DESC LIMIT 1) g ON true
+    """, (keep_recent,))
+
+    # カットオフが0以下のルームは削除対象がない
+    return {room_id: cutoff for room_id, cutoff in cur.fetchall() if cutoff > 0}
+
+
+def count_expired(cur, table: str, gen_col: str, room_id, cutoff: int,
+                  keep_every: int = KEEP_EVERY) -> int:
+    """削除対象の行数を数える（dry-run用）"""
+    cur.execute(f"""
+        SELECT COUNT(*) FROM {table}
+        WHERE room_id = %s AND {gen_col} < %s AND {gen_col} %% %s <> 0
+    """, (room_id, cutoff, keep_every))
+    return cur.fetchone()[0]
+
+
+def is_range_partitioned(cur, table: str) -> bool:
+    """05_partitioned_history.sql の入れ替え後で、created_at のレンジパーティションになっているか"""
+    cur.execute("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = %s AND p.partstrat = 'r'
+    """, (table,))
+    return cur.fetchone() is not None
+
+
+def delete_expired_batch(cur, table: str, gen_col: str, room_id, cutoff: int,
+                         last_key: tuple, batch_size: int,
+                         keep_every: int = KEEP_EVERY, by_created_at: bool = False):
+    """(世代, id) のキーセット順に1バッチ分を削除
+
+    前回バッチの最後のキーより後ろだけを対象にするので、
+    削除済みのデッドタプルを毎回スキャンし直すことはない。
+    削除は主キー全体で結合する。texts / genomes はハッシュキーの room_id で
+    パーティションが絞られ、パーティション化した mutations（by_created_at=True）は
+    (created_at, id) の主キーインデックスで引ける。
+    戻り値は (削除件数, 次のキー)。対象がなくなれば次のキーは None。
+    """
+    last_gen, last_id = last_key
+    key_join = "AND d.created_at = b.created_at" if by_created_at else ""
+    cur.execute(f"""
+        WITH batch AS (
+            SELECT id, {gen_col} AS gen, created_at FROM {table}
+            WHERE room_id = %s
+              AND {gen_col} < %s
+              AND {gen_col} %% %s <> 0
+              AND ({gen_col}, id) > (%s, %s::uuid)
+            ORDER BY {gen_col}, id
+            LIMIT %s
+        ), deleted AS (
+            DELETE FROM {table} d
+            USING batch b
+            WHERE d.room_id = %s AND d.id = b.id {key_join}
+            RETURNING b.gen, b.id
+        )
+        SELECT COUNT(*),
+               (array_agg(gen ORDER BY gen DESC, id DESC))[1],
+               (array_agg(id::text ORDER BY gen DESC, id DESC))[1]
+        FROM deleted
+    """, (room_id, cutoff, keep_every, last_gen, last_id, batch_size, room_id))
+    deleted, max_gen, max_id = cur.fetchone()
+
+    if deleted < batch_size:
+        return deleted, None
+    return deleted, (max_gen, max_id)
+
+
+def run_retention(conn, batch_size: int = 500, sleep_seconds: float = 0.2,
+                  time_budget: float = 300.0, dry_run: bool = False,
+                  lock_timeout_ms: int = 2000) -> dict:
+    """全ルーム・全履歴テーブルに保持ポリシーを適用
+
+    time_budget 秒を超えた時点でバッチの切れ目で停止する。
+    次回の実行は残りの対象から自然に再開される（削除済みの行は対象外になるため）。
+    """
+    started = time.monotonic()
+    cur = conn.cursor()
+
+    # ピーク時に他のトランザクションを待たせないよう、ロック待ちは短く打ち切る
+    cur.execute("SET lock_timeout = %s", (f"{lock_timeout_ms}ms",))
+    conn.commit()
+
+    cutoffs = compute_cutoffs(cur)
+    conn.commit()
+    print(f"🧮 Computed cutoffs for {len(cutoffs)} rooms "
+          f"(keep last {KEEP_RECENT_GENERATIONS}, then every {KEEP_EVERY}th)")
+
+    totals = {table: 0 for table in RETENTION_TABLES}
+    by_created_at = {table: is_range_partitioned(cur, table) for table in RETENTION_TABLES}
+    conn.commit()
+    budget_exhausted = False
+
+    for room_id, cutoff in cutoffs.items():
+        if budget_exhausted:
+            break
+
+        for table, gen_col in RETENTION_TABLES.items():
+            if dry_run:
+                count = count_expired(cur, table, gen_col, room_id, cutoff)
+                conn.commit()
+                totals[table] += count
+                print(f"  🔍 {table} room={room_id} cutoff={cutoff}: {count} rows would be deleted")
+                continue
+
+            key = START_KEY
+            room_deleted = 0
+            while key is not None:
+                if time.monotonic() - started > time_budget:
+                    budget_exhausted = True
+                    break
+
+                try:
+                    deleted, key = delete_expired_batch(
+                        cur, table, gen_col, room_id, cutoff, key, batch_size,
+                        by_created_at=by_created_at[table]
+                    )
+                    conn.commit()
+                except psycopg2.errors.LockNotAvailable:
+                    # 競合したバッチはスキップせず、少し待って同じキーから再試行
+                    conn.rollback()
+                    print(f"    ⚠️ Lock timeout on {table}, retrying")
+                    time.sleep(sleep_seconds)
+                    continue
+
+                room_deleted += deleted
+                totals[table] += deleted
+                if deleted:
+                    time.sleep(sleep_seconds)
+
+            if room_deleted:
+                print(f"  🧹 {table} room={room_id} cutoff={cutoff}: deleted {room_deleted} rows "
+                      f"({time.monotonic() - started:.1f}s elapsed)")
+
+            if budget_exhausted:
+                break
+
+    cur.close()
+
+    elapsed = time.monotonic() - started
+    if budget_exhausted:
+        print(f"\n⏱️ Time budget of {time_budget:.0f}s exhausted; rerun to continue")
+
+    print(f"\n📊 Retention summary ({'dry-run' if dry_run else 'deleted'}, {elapsed:.1f}s):")
+    for table, count in totals.items():
+        print(f"  - {table}: {count} rows")
+
+    return {
+        'totals': totals,
+        'elapsed': elapsed,
+        'completed': not budget_exhausted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist 履歴テーブルのリテンションワーカー')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='1トランザクションで削除する最大行数')
+    parser.add_argument('--sleep', type=float, default=0.2,
+                        help='バッチ間のスリープ秒数')
+    parser.add_argument('--time-budget', type=float, default=300.0,
+                        help='この秒数を超えたらバッチの切れ目で停止')
+    parser.add_argument('--lock-timeout-ms', type=int, default=2000,
+                        help='行ロック待ちの上限（ミリ秒）')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='削除せずに対象件数だけを表示')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    args = parser.parse_args()
+
+    with open(args.conn_info, 'r') as f:
+        conn_info = json.load(f)
+
+    conn = connect(conn_info)
+    print(f"🔗 Connected to {conn_info['endpoint']}")
+
+    try:
+        run_retention(
+            conn,
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            time_budget=args.time_budget,
+            dry_run=args.dry_run,
+            lock_timeout_ms=args.lock_timeout_ms,
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
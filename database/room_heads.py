@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+room_heads（ルームの最新状態テーブル）の投入と整合性チェック
+
+  apply     06_room_heads.sql を適用（既存ルームの行も作成される）
+  backfill  texts / genomes の最新世代から room_heads を作り直す
+  verify    room_heads と texts / genomes の最新世代を比較（--fix で不一致を修復）
+
+使い方:
+  python room_heads.py apply
+  python room_heads.py backfill --batch-size 200
+  python room_heads.py verify --fix
+"""
+import argparse
+import json
+
+from db_utils import apply_sql_file, connect
+
+SCHEMA_FILE = '06_room_heads.sql'
+
+# ルームごとの最新テキスト・最新ゲノムを求めるクエリ（backfill / verify 共通）
+LATEST_STATE_SQL = """
+    SELECT r.name, r.id, r.created_at, r.updated_at,
+           t.generation AS text_generation, t.content,
+           g.generation AS genome_generation, g.genome_data, g.mutation_count
+    FROM rooms r
+    LEFT JOIN LATERAL (
+        SELECT generation, content FROM texts
+        WHERE room_id = r.id
+        ORDER BY generation DESC
+        LIMIT 1
+    ) t ON true
+    LEFT JOIN LATERAL (
+        SELECT generation, genome_data, mutation_count FROM genomes
+        WHERE room_id = r.id
+        ORDER BY generation DESC
+        LIMIT 1
+    ) g ON true
+"""
+
+
+def apply_schema(conn):
+    """room_heads テーブルとトリガーを作成"""
+    apply_sql_file(conn, SCHEMA_FILE)
+
+
+def upsert_heads(cur, room_ids: list, force: bool = False) -> int:
+    """指定ルームの最新状態を room_heads に書き込む
+
+    force=False の場合、クエリ実行中にトリガーが書き込んだ新しい世代を
+    古いスナップショットで上書きしないよう、世代が進んでいる行は更新しない。
+    同名のルームがある場合は、トリガーと同じく既に行を持っているルームを優先する。
+    """
+    guard = "" if force else "AND room_heads.generation <= EXCLUDED.generation"
+    cur.execute(f"""
+        INSERT INTO room_heads (room_name, room_id, generation,
+                                text_generation, current_text,
+                                genome_generation, genome_data, mutation_count,
+                                created_at, updated_at)
+        SELECT s.name, s.id,
+               COALESCE(GREATEST(s.text_generation, s.genome_generation), 0),
+               s.text_generation, s.content,
+               s.genome_generation, s.genome_data, COALESCE(s.mutation_count, 0),
+               s.created_at, s.updated_at
+        FROM ({LATEST_STATE_SQL}) s
+        WHERE s.id = ANY(%s::uuid[])
+        ON CONFLICT (room_name) DO UPDATE SET
+            generation = EXCLUDED.generation,
+            text_generation = EXCLUDED.text_generation,
+            current_text = EXCLUDED.current_text,
+            genome_generation = EXCLUDED.genome_generation,
+            genome_data = EXCLUDED.genome_data,
+            mutation_count = EXCLUDED.mutation_count,
+            created_at = EXCLUDED.created_at,
+            updated_at = EXCLUDED.updated_at
+        WHERE room_heads.room_id = EXCLUDED.room_id {guard}
+    """, ([str(room_id) for room_id in room_ids],))
+    return cur.rowcount
+
+
+def backfill(conn, batch_size: int = 200) -> int:
+    """全ルームの room_heads をルームIDのキーセット順に作成
+
+    トリガーを設定した後に実行すれば、稼働中でも取りこぼしなく投入できる。
+    """
+    cur = conn.cursor()
+    last_id = '00000000-0000-0000-0000-000000000000'
+    total = 0
+
+    while True:
+        cur.execute("""
+            SELECT id FROM rooms
+            WHERE id > %s::uuid
+            ORDER BY id
+            LIMIT %s
+        """, (last_id, batch_size))
+        room_ids = [row[0] for row in cur.fetchall()]
+        if not room_ids:
+            conn.commit()
+            break
+
+        total += upsert_heads(cur, room_ids)
+        conn.commit()
+        last_id = str(room_ids[-1])
+        print(f"  📦 {total} room heads written")
+
+    cur.close()
+    print(f"✅ Backfilled {total} room heads")
+    return total
+
+
+def verify(conn, fix: bool = False) -> list:
+    """room_heads と texts / genomes の最新世代を比較
+
+    不一致・欠落・孤立した行を表示し、fix=True なら該当ルームを再投入する。
+    """
+    cur = conn.cursor()
+
+    cur.execute("SELECT name, COUNT(*) FROM rooms GROUP BY name HAVING COUNT(*) > 1")
+    duplicates = dict(cur.fetchall())
+    for name, count in duplicates.items():
+        print(f"  ⚠️ Room name '{name}' is used by {count} rooms; room_heads keeps only one")
+
+    cur.execute(f"""
+        SELECT s.id, s.name,
+               s.text_generation, h.text_generation,
+               s.genome_generation, h.genome_generation,
+               h.room_id IS NULL AS missing,
+               (s.content IS DISTINCT FROM h.current_text
+                OR s.genome_data IS DISTINCT FROM h.genome_data) AS content_differs
+        FROM ({LATEST_STATE_SQL}) s
+        LEFT JOIN room_heads h ON h.room_name = s.name AND h.room_id = s.id
+    """)
+    problems = []
+    for (room_id, name, text_gen, head_text_gen, genome_gen, head_genome_gen,
+         missing, content_differs) in cur.fetchall():
+        if name in duplicates:
+            # 同名ルームは1行にまとめられるため自動修復の対象外
+            continue
+        if missing:
+            problems.append(room_id)
+            print(f"  ❌ {name}: missing from room_heads")
+        elif (text_gen != head_text_gen or genome_gen != head_genome_gen or content_differs):
+            problems.append(room_id)
+            print(f"  ❌ {name}: text {head_text_gen} (expected {text_gen}), "
+                  f"genome {head_genome_gen} (expected {genome_gen})"
+                  + (", content differs" if content_differs else ""))
+
+    cur.execute("""
+        SELECT h.room_name FROM room_heads h
+        LEFT JOIN rooms r ON r.id = h.room_id AND r.name = h.room_name
+        WHERE r.id IS NULL
+    """)
+    orphans = [row[0] for row in cur.fetchall()]
+    for name in orphans:
+        print(f"  ❌ {name}: room_heads row has no matching room")
+    conn.commit()
+
+    if not problems and not orphans:
+        print("✅ room_heads is consistent")
+    elif fix:
+        if orphans:
+            cur.execute("""
+                DELETE FROM room_heads h
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM rooms r WHERE r.id = h.room_id AND r.name = h.room_name
+                )
+            """)
+        if problems:
+            upsert_heads(cur, problems, force=True)
+        conn.commit()
+        print(f"🔧 Fixed {len(problems)} rooms, removed {len(orphans)} orphan rows")
+    else:
+        print(f"⚠️ {len(problems)} inconsistent rooms, {len(orphans)} orphan rows (rerun with --fix)")
+
+    cur.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist room_heads の投入と整合性チェック')
+    parser.add_argument('--conn-info', default='rds_connection_info.json',
+                        help='接続情報JSONファイル')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('apply', help='テーブルとトリガーを作成')
+
+    p = sub.add_parser('backfill', help='既存データから room_heads を作成')
+    p.add_argument('--batch-size', type=int, default=200)
+
+    p = sub.add_parser('verify', help='整合性をチェック')
+    p.add_argument('--fix', action='store_true', help='不一致を修復する')
+
+    args = parser.parse_args()
+
+    with open(args.conn_info, 'r') as f:
+        conn_info = json.load(f)
+
+    conn = connect(conn_info)
+    print(f"🔗 Connected to {conn_info['endpoint']}")
+
+    try:
+        if args.command == 'apply':
+            apply_schema(conn)
+        elif args.command == 'backfill':
+            backfill(conn, args.batch_size)
+        elif args.command == 'verify':
+            verify(conn, args.fix)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
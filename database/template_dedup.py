@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+MinHash / LSH による文テンプレートの近似重複除去
+
+extract_sentence_patterns と投入処理は文字列の完全一致でしか重複を除かないため、
+助詞や句読点だけが違うテンプレートが sentence_templates に大量に入ってしまう。
+ここではテンプレートの文字シングルの MinHash 署名を作り、LSHバンディングで
+近いテンプレートの候補だけを比較して、ほぼ線形時間でクラスタにまとめる。
+
+  - 句読点と空白を除いてから shingle_size 文字のシングルを作る
+  - num_perm 個のハッシュ関数の最小値を署名とし、bands x rows に分割して
+    バンドごとのバケットで候補を探す（しきい値 ≈ (1/bands)^(1/rows)）
+  - 候補クラスタの代表と署名の一致率（推定Jaccard係数）が threshold 以上なら合流
+  - 各クラスタは最も頻出した表記を代表とし、出現回数の合計を重みにする
+
+テンプレートは1件ずつ add() で流し込めるので、全作品を順に処理しても
+保持するのはクラスタ代表の署名とバケットだけになる。
+
+必要なパッケージ:
+  pip install numpy
+"""
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# シングル化の前に除く文字（句読点・括弧・空白）
+PUNCTUATION_RE = re.compile(r'[。、，．！？!?「」『』（）()…―─・：；:;\s]')
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_SHINGLE_SIZE = 2
+DEFAULT_THRESHOLD = 0.6
+
+# 32bit ハッシュより大きい素数（a*h + b が uint64 に収まる範囲で使う）
+MERSENNE_PRIME = np.uint64(4294967311)
+
+
+def normalize_template(template: str) -> str:
+    """句読点と空白を除いた比較用の文字列"""
+    return PUNCTUATION_RE.sub('', template)
+
+
+def shingle_hashes(text: str, shingle_size: int = DEFAULT_SHINGLE_SIZE) -> np.ndarray:
+    """文字シングルの32bitハッシュ（短い文字列は全体を1つのシングルとする）"""
+    if len(text) <= shingle_size:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+    return np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64)
+
+
+class TemplateDeduplicator:
+    """テンプレートを逐次クラスタリングして代表と重みを保持する"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS,
+                 threshold: float = DEFAULT_THRESHOLD,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+
+        # クラスタ番号 -> 情報
+        self.signatures: List[np.ndarray] = []
+        self.namespaces: List[Tuple] = []
+        self.variants: List[Counter] = []
+        # (名前空間, 正規化文字列) -> クラスタ番号（完全一致の近道）
+        self._exact: Dict[Tuple, int] = {}
+        # (名前空間, バンド番号, バンドの署名) -> クラスタ番号のリスト
+        self._buckets: Dict[Tuple, List[int]] = defaultdict(list)
+        self.total_added = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash 署名（num_perm 個のハッシュ関数それぞれの最小値）"""
+        hashes = shingle_hashes(text, self.shingle_size)
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, namespace: Tuple, signature: np.ndarray):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield (namespace, band, chunk.tobytes())
+
+    def add(self, template: str, namespace: Tuple = (), count: int = 1) -> int:
+        """テンプレートを追加し、所属するクラスタ番号を返す
+
+        namespace が異なるテンプレート同士（例: ジャンル違い）はまとめない。
+        """
+        self.total_added += count
+        normalized = normalize_template(template)
+        exact_key = (namespace, normalized)
+
+        cluster = self._exact.get(exact_key)
+        if cluster is None:
+            signature = self.signature(normalized)
+            cluster = self._find_similar(namespace, signature)
+            if cluster is None:
+                cluster = len(self.signatures)
+                self.signatures.append(signature)
+                self.namespaces.append(namespace)
+                self.variants.append(Counter())
+                for key in self._band_keys(namespace, signature):
+                    self._buckets[key].append(cluster)
+            self._exact[exact_key] = cluster
+
+        self.variants[cluster][template] += count
+        return cluster
+
+    def _find_similar(self, namespace: Tuple, signature: np.ndarray) -> Optional[int]:
+        """バンドを共有するクラスタ代表のうち、推定Jaccard係数が最大のものを返す"""
+        candidates = set()
+        for key in self._band_keys(namespace, signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for cluster in candidates:
+            similarity = float(np.mean(self.signatures[cluster] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = cluster, similarity
+        return best
+
+    def clusters(self) -> List[dict]:
+        """クラスタごとの代表（最頻の表記）と重み（出現回数の合計）を重みの降順で返す"""
+        result = []
+        for cluster, variants in enumerate(self.variants):
+            representative, _ = variants.most_common(1)[0]
+            result.append({
+                'namespace': self.namespaces[cluster],
+                'template': representative,
+                'weight': sum(variants.values()),
+                'variants': len(variants),
+            })
+        result.sort(key=lambda c: c['weight'], reverse=True)
+        return result
+
+    def stats(self) -> dict:
+        """クラスタリングの統計"""
+        sizes = [len(v) for v in self.variants]
+        distinct = sum(sizes)
+        return {
+            'templates': self.total_added,
+            'distinct_templates': distinct,
+            'clusters': len(self.variants),
+            'merged_clusters': sum(1 for s in sizes if s > 1),
+            'largest_cluster': max(sizes, default=0),
+            'reduction': 1 - len(self.variants) / distinct if distinct else 0.0,
+        }
+
+
+def dedup_templates(templates: Iterable[Tuple[str, Tuple]], **kwargs) -> Tuple[List[dict], dict]:
+    """(テンプレート, 名前空間) の列を重複除去し、(クラスタ一覧, 統計) を返す"""
+    deduplicator = TemplateDeduplicator(**kwargs)
+    for template, namespace in templates:
+        deduplicator.add(template, namespace)
+    return deduplicator.clusters(), deduplicator.stats()
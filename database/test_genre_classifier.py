@@ -0,0 +1,68 @@
+"""
+genre_classifier のテスト
+
+  python -m pytest test_genre_classifier.py
+"""
+import random
+
+import numpy as np
+
+from genre_classifier import DEFAULT_MIN_CONFIDENCE, GenreClassifier
+
+KEYWORDS = {
+    'horror': {'主体': ['幽霊', '亡霊'], '場所': ['墓場', '廃屋'], '感情': ['恐怖']},
+    'mystery': {'主体': ['探偵', '犯人'], '場所': ['書斎'], '発見物': ['凶器', '死体']},
+    'romance': {'主体': ['恋人', '彼女'], '動作': ['告白'], '感情': ['ときめき']},
+}
+FILLER = [chr(c) for c in range(0x3041, 0x3094)] + list('山川風雨夜朝道町家窓')
+
+
+def make_text(rng: random.Random, genre: str, chars: int) -> str:
+    words = [w for slot in KEYWORDS[genre].values() for w in slot]
+    parts, size = [], 0
+    while size < chars:
+        part = rng.choice(words) if rng.random() < 0.05 else rng.choice(FILLER)
+        parts.append(part)
+        size += len(part)
+    return ''.join(parts)
+
+
+def trained_classifier() -> GenreClassifier:
+    rng = random.Random(0)
+    return GenreClassifier(KEYWORDS).fit(
+        {genre: [make_text(rng, genre, 5000) for _ in range(5)] for genre in KEYWORDS}
+    )
+
+
+def test_keyword_features_match_str_count():
+    classifier = GenreClassifier(KEYWORDS)
+    text = '幽霊が墓場に出た。探偵は幽霊を見た。ときめき' * 3
+    indices, counts = classifier.features(text)
+    features = dict(zip(indices.tolist(), counts.tolist()))
+    for k, keyword in enumerate(classifier.keywords):
+        expected = text.count(keyword) * classifier.keyword_weight
+        assert features.get(classifier.n_features + k, 0) == expected
+
+
+def test_short_texts_stay_below_min_confidence():
+    classifier = trained_classifier()
+    proba = classifier.predict_proba(['幽霊', '探偵', '恋人に告白', ''])
+    assert (proba.max(axis=1) < DEFAULT_MIN_CONFIDENCE).all()
+
+
+def test_long_texts_are_accepted():
+    classifier = trained_classifier()
+    rng = random.Random(1)
+    works = [(genre, make_text(rng, genre, 20000)) for genre in KEYWORDS]
+    accepted, review = classifier.classify(works)
+    assert not review
+    assert [result['genre'] for result in accepted] == [genre for genre, _ in works]
+
+
+def test_save_and_load_keep_predictions(tmp_path):
+    classifier = trained_classifier()
+    path = str(tmp_path / 'model.npz')
+    classifier.save(path)
+    loaded = GenreClassifier.load(path)
+    texts = ['幽霊が墓場に出た', make_text(random.Random(2), 'mystery', 3000)]
+    assert np.allclose(loaded.predict_proba(texts), classifier.predict_proba(texts))
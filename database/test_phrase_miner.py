@@ -0,0 +1,51 @@
+"""
+phrase_miner のテスト
+
+  python -m pytest test_phrase_miner.py
+"""
+import random
+from collections import Counter
+
+from phrase_miner import SEPARATORS, count_ngrams, score_phrases
+
+
+def brute_force_ngrams(text: str, min_len: int, max_len: int, min_count: int) -> Counter:
+    """区切り文字を含まない全ての部分文字列を数える"""
+    counts = Counter()
+    for m in range(min_len, max_len + 1):
+        for i in range(len(text) - m + 1):
+            gram = text[i:i + m]
+            if not any(c in SEPARATORS for c in gram):
+                counts[gram] += 1
+    return Counter({gram: n for gram, n in counts.items() if n >= min_count})
+
+
+def test_count_ngrams_matches_brute_force():
+    rng = random.Random(0)
+    # 繰り返しが多くなるよう小さいアルファベットに区切り文字を混ぜる
+    alphabet = 'あいうえ山川' + '。、「」\n'
+    for _ in range(50):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+        for min_len, max_len, min_count in [(2, 8, 2), (1, 5, 1), (3, 16, 3)]:
+            assert count_ngrams(text, min_len, max_len, min_count) == \
+                brute_force_ngrams(text, min_len, max_len, min_count)
+
+
+def test_count_ngrams_repeats():
+    text = '探偵は犯人を推理した。' * 5
+    assert count_ngrams(text, 2, 8) == brute_force_ngrams(text, 2, 8, 2)
+
+
+def test_score_phrases_drops_shifted_windows():
+    # max_len より長い繰り返しは1文字ずつずれた窓がどれも同じ回数になる
+    text = '探偵は事件の犯人を推理した。' * 20
+    genre_counts = {'mystery': count_ngrams(text, 2, 8), 'romance': Counter()}
+    genre_chars = {'mystery': len(text), 'romance': len(text)}
+
+    phrases = [phrase for phrase, _, _ in
+               score_phrases(genre_counts, genre_chars, top=10, max_len=8)['mystery']]
+    assert phrases
+    for i, a in enumerate(phrases):
+        for b in phrases[i + 1:]:
+            assert a not in b and b not in a
+            assert not any(a.endswith(b[:k]) or b.endswith(a[:k]) for k in range(7, min(len(a), len(b))))
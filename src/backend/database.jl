@@ -77,10 +77,11 @@ function save_room(room::Room)
     
     if isempty(result)
         # 新規作成
+        room_uuid = string(uuid4())
         LibPQ.execute(conn,
             """INSERT INTO rooms (id, name, current_generation, created_at, updated_at)
                VALUES (\$1, \$2, \$3, \$4, \$5)""",
-            [string(uuid4()), room.id, room.generation, room.created_at, room.updated_at]
+            [room_uuid, room.id, room.generation, room.created_at, room.updated_at]
         )
     else
         # 更新
@@ -93,67 +94,40 @@ function save_room(room::Room)
         )
     end
     
-    # ゲノムを保存
-    save_genome(conn, room)
-    
-    # テキストを保存
-    save_text(conn, room)
+    # ゲノムとテキストを保存（取得済みのroom_uuidを使い回す）
+    # room_headsはtexts/genomesのトリガーで更新される
+    save_genome(conn, room, room_uuid)
+    save_text(conn, room, room_uuid)
 end
 
-function save_genome(conn, room::Room)
-    # room.idをroom名として使用
-    result = LibPQ.execute(conn, "SELECT id FROM rooms WHERE name = \$1", [room.id])
-    if !isempty(result)
-        room_uuid = result[1,1]
-        
-        # 既存の同じgenerationのゲノムをチェック
-        existing = LibPQ.execute(conn,
-            "SELECT id FROM genomes WHERE room_id = \$1 AND generation = \$2",
-            [room_uuid, room.generation]
-        )
-        
-        if isempty(existing)
-            LibPQ.execute(conn,
-                """INSERT INTO genomes (id, room_id, generation, genome_data, mutation_count, created_at)
-                   VALUES (\$1, \$2, \$3, \$4, \$5, \$6)""",
-                [string(uuid4()), room_uuid, room.generation, genome_to_json(room.current_genome), 0, room.updated_at]
-            )
-        end
-    end
+function save_genome(conn, room::Room, room_uuid)
+    # UNIQUE(room_id, generation) により同じ世代の二重保存は無視される
+    LibPQ.execute(conn,
+        """INSERT INTO genomes (id, room_id, generation, genome_data, mutation_count, created_at)
+           VALUES (\$1, \$2, \$3, \$4, \$5, \$6)
+           ON CONFLICT (room_id, generation) DO NOTHING""",
+        [string(uuid4()), room_uuid, room.generation, genome_to_json(room.current_genome), 0, room.updated_at]
+    )
 end
 
-function save_text(conn, room::Room)
-    result = LibPQ.execute(conn, "SELECT id FROM rooms WHERE name = \$1", [room.id])
-    if !isempty(result)
-        room_uuid = result[1,1]
-        
-        # 既存の同じgenerationのテキストをチェック
-        existing = LibPQ.execute(conn,
-            "SELECT id FROM texts WHERE room_id = \$1 AND generation = \$2",
-            [room_uuid, room.generation]
-        )
-        
-        if isempty(existing)
-            LibPQ.execute(conn,
-                """INSERT INTO texts (id, room_id, generation, content, created_at)
-                   VALUES (\$1, \$2, \$3, \$4, \$5)""",
-                [string(uuid4()), room_uuid, room.generation, room.current_text, room.updated_at]
-            )
-        end
-    end
+function save_text(conn, room::Room, room_uuid)
+    LibPQ.execute(conn,
+        """INSERT INTO texts (id, room_id, generation, content, created_at)
+           VALUES (\$1, \$2, \$3, \$4, \$5)
+           ON CONFLICT (room_id, generation) DO NOTHING""",
+        [string(uuid4()), room_uuid, room.generation, room.current_text, room.updated_at]
+    )
 end
 
 function load_room(room_name::String)
     conn = get_db_connection()
     
-    # ルーム情報を取得
+    # ルームの最新状態を取得（room_headsの主キー検索1回）
     result = LibPQ.execute(conn,
-        """SELECT r.id, r.current_generation, r.created_at, r.updated_at,
-                  t.content, g.genome_data
-           FROM rooms r
-           LEFT JOIN texts t ON r.id = t.room_id AND r.current_generation = t.generation
-           LEFT JOIN genomes g ON r.id = g.room_id AND r.current_generation = g.generation
-           WHERE r.name = \$1""",
+        """SELECT room_id, generation, created_at, updated_at,
+                  current_text, genome_data
+           FROM room_heads
+           WHERE room_name = \$1""",
         [room_name]
     )
     
@@ -196,9 +170,14 @@ end
 function save_mutation(room_name::String, operator::String, actor::String, generation_before::Int, generation_after::Int, text_preview::String)
     conn = get_db_connection()
     
-    # room_nameからroom_idを取得
-    result = LibPQ.execute(conn, "SELECT id FROM rooms WHERE name = \$1", [room_name])
-    if !isempty(result)
+    # room_nameからroom_idを取得（room_headsに行がなければroomsの最初のルーム）
+    result = LibPQ.execute(conn,
+        """SELECT COALESCE(
+               (SELECT room_id FROM room_heads WHERE room_name = \$1),
+               (SELECT id FROM rooms WHERE name = \$1 ORDER BY created_at, id LIMIT 1))""",
+        [room_name]
+    )
+    if !isempty(result) && !ismissing(result[1,1])
         room_uuid = result[1,1]
         
         LibPQ.execute(conn,
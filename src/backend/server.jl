@@ -58,10 +58,9 @@ end
     conn = get_db_connection()
     
     result = LibPQ.execute(conn,
-        """SELECT r.id, r.name, r.current_generation, r.updated_at, t.content
-           FROM rooms r
-           LEFT JOIN texts t ON r.id = t.room_id AND r.current_generation = t.generation
-           ORDER BY r.name"""
+        """SELECT room_id, room_name, generation, updated_at, current_text
+           FROM room_heads
+           ORDER BY room_name"""
     )
     
     rooms_data = []
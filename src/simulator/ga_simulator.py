@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+GA Novelist オフライン集団進化シミュレーター
+
+ga_population.jl の集団進化（calculate_fitness / tournament_selection / crossover /
+evolve_generation）と ga_hybrid.jl の mutate_* による重み更新を、
+全ルームの集団をまとめた NumPy 配列で再現する。テキスト生成は行わず、
+遺伝子の数値部分だけを扱うので、数千ルーム×数千世代をCPUで数秒で回せる。
+
+集団は (ルーム数, 個体数, 列数) の1つの行列で表し、列はジャンル重み・スタイル・
+変異回数・特性数・要素数（character_traits / setting_elements の要素数）の順に並ぶ。
+
+使い方:
+  python ga_simulator.py --rooms 2000 --generations 2000
+  python ga_simulator.py --sweep tournament_size=2,3,5 --sweep weight_step=0.1,0.3 --output sweep.json
+
+必要なパッケージ:
+  pip install numpy
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+# ga_hybrid.jl の create_initial_genome と同じ順序・初期値
+GENRES = ['horror', 'romance', 'scifi', 'comedy', 'mystery']
+STYLES = ['dialogue_ratio', 'description_density', 'pace', 'poetic_level', 'complexity']
+INITIAL_GENRE_WEIGHTS = [0.2, 0.2, 0.2, 0.2, 0.2]
+INITIAL_STYLE_PARAMS = [0.2, 0.5, 0.5, 0.3, 0.5]
+INITIAL_TRAITS = 1    # ["少年"]
+INITIAL_SETTINGS = 3  # ["森", "小道", "光"]
+
+# apply_mutation のオペレーター -> (更新対象, 対象名)
+OPERATORS = {
+    'もっとホラー': ('genre', 'horror'),
+    'もっとロマンス': ('genre', 'romance'),
+    'もっとSF': ('genre', 'scifi'),
+    'もっとコメディ': ('genre', 'comedy'),
+    'もっと詩的に': ('style', 'poetic_level'),
+    'もっとスピード感': ('style', 'pace'),
+    'もっとセリフを': ('style', 'dialogue_ratio'),
+    'もっとキャラを増やす': ('traits', None),
+    'もっと舞台を変える': ('settings', None),
+    'もっと混沌': ('none', None),
+}
+
+# get_target_genre と同じ対応（それ以外のオペレーターは horror が目標）
+TARGET_GENRES = {
+    'もっとホラー': 'horror',
+    'もっとロマンス': 'romance',
+    'もっとSF': 'scifi',
+    'もっとコメディ': 'comedy',
+    'もっとミステリー': 'mystery',
+}
+
+# ga_population.jl / ga_hybrid.jl の定数
+DEFAULT_PARAMS = {
+    'population_size': 5,
+    'tournament_size': 3,     # tournament_selection
+    'crossover_rate': 0.5,    # crossover の片親選択確率
+    'mutation_rate': 0.8,     # evolve_generation の突然変異確率
+    'weight_step': 0.3,       # mutate_* の重み増分
+    'evolution_bonus': 0.05,  # calculate_fitness の変異回数ボーナス
+    'diversity_bonus': 0.02,  # calculate_fitness の要素数ボーナス
+}
+
+
+# 遺伝子行列の列配置: [ジャンル重み | スタイル | 変異回数 | 特性数 | 要素数]
+GENRE_COLS = slice(0, len(GENRES))
+STYLE_COLS = slice(len(GENRES), len(GENRES) + len(STYLES))
+WEIGHT_COLS = slice(0, len(GENRES) + len(STYLES))  # 交叉・クリップの対象
+MUTATION_COUNT = len(GENRES) + len(STYLES)
+N_TRAITS = MUTATION_COUNT + 1
+N_SETTINGS = MUTATION_COUNT + 2
+N_COLS = MUTATION_COUNT + 3
+
+
+def create_populations(n_rooms: int, population_size: int) -> np.ndarray:
+    """全ルーム分の初期集団を (ルーム数, 個体数, 列数) の行列で作成（create_population 相当）"""
+    initial = np.zeros(N_COLS)
+    initial[GENRE_COLS] = INITIAL_GENRE_WEIGHTS
+    initial[STYLE_COLS] = INITIAL_STYLE_PARAMS
+    initial[N_TRAITS] = INITIAL_TRAITS
+    initial[N_SETTINGS] = INITIAL_SETTINGS
+    return np.broadcast_to(initial, (n_rooms, population_size, N_COLS)).copy()
+
+
+def operator_increments(operators: list, weight_step: float) -> np.ndarray:
+    """ルームごとのオペレーターを変異時の増分行列 (ルーム数, 列数) に変換
+
+    どのオペレーターでも変異回数は1増える。
+    """
+    increments = np.zeros((len(operators), N_COLS))
+    increments[:, MUTATION_COUNT] = 1
+
+    for i, operator in enumerate(operators):
+        kind, target = OPERATORS[operator]
+        if kind == 'genre':
+            increments[i, GENRES.index(target)] = weight_step
+        elif kind == 'style':
+            increments[i, STYLE_COLS.start + STYLES.index(target)] = weight_step
+        elif kind == 'traits':
+            increments[i, N_TRAITS] = 1
+        elif kind == 'settings':
+            increments[i, N_SETTINGS] = 1
+
+    return increments
+
+
+def calculate_fitness(pop: np.ndarray, target_idx: np.ndarray, params: dict) -> np.ndarray:
+    """全個体の適応度を一括計算（calculate_fitness 相当）
+
+    target_idx はルームごとの目標ジャンルの列番号 (R,)。戻り値は (R, P)。
+    """
+    base = pop[np.arange(len(pop)), :, target_idx]
+    evolution = pop[:, :, MUTATION_COUNT] * params['evolution_bonus']
+    diversity = (pop[:, :, N_TRAITS] + pop[:, :, N_SETTINGS]) * params['diversity_bonus']
+    return base + evolution + diversity
+
+
+def gather(pop: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """ルームごとの個体番号 (R, N) から個体を取り出して (R, N, 列数) を返す"""
+    n_rooms, population_size, n_cols = pop.shape
+    flat = idx + (np.arange(n_rooms) * population_size)[:, None]
+    return pop.reshape(-1, n_cols)[flat]
+
+
+def tournament_selection(fitness: np.ndarray, n_select: int, tournament_size: int,
+                         rng: np.random.Generator) -> np.ndarray:
+    """ルームごとに n_select 回のトーナメント選択を一括実行
+
+    候補は復元抽出（rand(population.individuals, k) と同じ）。戻り値は個体番号 (R, n_select)。
+    """
+    n_rooms, population_size = fitness.shape
+    candidates = rng.integers(0, population_size, size=(n_rooms, n_select, tournament_size))
+    rows = np.arange(n_rooms)[:, None, None]
+    best = fitness[rows, candidates].argmax(axis=2)
+    return np.take_along_axis(candidates, best[:, :, None], axis=2)[:, :, 0]
+
+
+def crossover(parent1: np.ndarray, parent2: np.ndarray, crossover_rate: float,
+              rng: np.random.Generator) -> np.ndarray:
+    """一様交叉（crossover 相当）
+
+    ジャンル重みとスタイルは遺伝子ごとに crossover_rate の確率で parent2 から受け継ぐ。
+    変異回数は parent1 のまま（deepcopy(parent1) と同じ）。
+    特性・要素数は parent1 から最大2個、parent2 から最大1個を選ぶ数で近似する
+    （Julia 版の unique による重複除去は数値モデルでは再現しない）。
+    """
+    # 乱数は float32 で十分（マスクの生成がシミュレーション全体の大半を占める）
+    mask = rng.random(parent1.shape, dtype=np.float32) < crossover_rate
+    mask[:, :, WEIGHT_COLS.stop:] = False
+    child = np.where(mask, parent2, parent1)
+
+    counts = [N_TRAITS, N_SETTINGS]
+    child[:, :, counts] = np.minimum(parent1[:, :, counts], 2) + np.minimum(parent2[:, :, counts], 1)
+    return child
+
+
+def mutate(children: np.ndarray, increments: np.ndarray, mutation_rate: float,
+           rng: np.random.Generator) -> np.ndarray:
+    """mutate_* の重み更新を mutation_rate の確率で一括適用
+
+    重みは min(1.0, w + weight_step) でクリップし、変異した個体の mutation_count を1増やす。
+    """
+    mutated = rng.random(children.shape[:2], dtype=np.float32) < mutation_rate
+    children += mutated[:, :, None] * increments[:, None, :]
+    np.minimum(children[:, :, WEIGHT_COLS], 1.0, out=children[:, :, WEIGHT_COLS])
+    return children
+
+
+def evolve_generation(pop: np.ndarray, target_idx: np.ndarray, increments: np.ndarray,
+                      params: dict, rng: np.random.Generator) -> np.ndarray:
+    """全ルームを一世代進める（evolve_generation 相当）
+
+    各ルームの最良個体を先頭に残し（エリート保存）、残りを選択・交叉・突然変異で生成する。
+    """
+    fitness = calculate_fitness(pop, target_idx, params)
+    elite = fitness.argmax(axis=1)[:, None]
+    n_children = pop.shape[1] - 1
+
+    idx1 = tournament_selection(fitness, n_children, params['tournament_size'], rng)
+    idx2 = tournament_selection(fitness, n_children, params['tournament_size'], rng)
+
+    children = crossover(gather(pop, idx1), gather(pop, idx2), params['crossover_rate'], rng)
+    children = mutate(children, increments, params['mutation_rate'], rng)
+
+    return np.concatenate([gather(pop, elite), children], axis=1)
+
+
+def population_stats(pop: np.ndarray, fitness: np.ndarray, target_idx: np.ndarray) -> dict:
+    """集団の統計（get_population_stats の全ルーム平均）と遺伝子の多様性"""
+    target_weight = pop[np.arange(len(pop)), :, target_idx]
+    return {
+        'best_fitness': float(fitness.max(axis=1).mean()),
+        'average_fitness': float(fitness.mean()),
+        'fitness_variance': float(fitness.var(axis=1, ddof=1).mean()) if fitness.shape[1] > 1 else 0.0,
+        'target_weight': float(target_weight.mean()),
+        # 個体間の遺伝子の標準偏差（ルーム・遺伝子の平均）。0なら集団が収束している
+        'diversity': float(pop[:, :, WEIGHT_COLS].std(axis=1).mean()),
+    }
+
+
+def simulate(n_rooms: int = 1000, n_generations: int = 1000, operators=None,
+             params: dict = None, seed: int = 42, stats_every: int = 10) -> dict:
+    """複数ルームの集団進化をシミュレーション
+
+    operators はルームごとのオペレーター名のリスト。省略時は全ルームに
+    OPERATORS を順番に割り当てる。収束世代は最良個体の目標ジャンル重みが
+    初めて1.0に達した世代（目標ジャンル以外のオペレーターでは未収束のまま）。
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    rng = np.random.default_rng(seed)
+
+    if operators is None:
+        names = list(OPERATORS)
+        operators = [names[i % len(names)] for i in range(n_rooms)]
+    target_idx = np.array([GENRES.index(TARGET_GENRES.get(op, 'horror')) for op in operators])
+    increments = operator_increments(operators, params['weight_step'])
+
+    pop = create_populations(n_rooms, params['population_size'])
+    converged_at = np.full(n_rooms, -1, dtype=np.int64)
+    history = []
+
+    started = time.perf_counter()
+    for generation in range(1, n_generations + 1):
+        pop = evolve_generation(pop, target_idx, increments, params, rng)
+
+        # エリートは先頭に置かれるので、先頭個体の目標重みで収束を判定
+        elite_target = pop[np.arange(n_rooms), 0, target_idx]
+        newly = (converged_at < 0) & (elite_target >= 1.0 - 1e-9)
+        converged_at[newly] = generation
+
+        if generation % stats_every == 0 or generation == n_generations:
+            fitness = calculate_fitness(pop, target_idx, params)
+            history.append({'generation': generation,
+                            **population_stats(pop, fitness, target_idx)})
+    elapsed = time.perf_counter() - started
+
+    converged = converged_at[converged_at > 0]
+    return {
+        'params': params,
+        'rooms': n_rooms,
+        'generations': n_generations,
+        'elapsed_seconds': elapsed,
+        'converged_fraction': float(len(converged) / n_rooms),
+        'mean_convergence_generation': float(converged.mean()) if len(converged) else None,
+        'median_convergence_generation': float(np.median(converged)) if len(converged) else None,
+        'final': history[-1] if history else None,
+        'history': history,
+    }
+
+
+def parse_sweep(specs: list) -> list:
+    """--sweep name=v1,v2 の指定をパラメータの組み合わせに展開"""
+    axes = []
+    for spec in specs:
+        name, values = spec.split('=', 1)
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown parameter: {name}")
+        cast = type(DEFAULT_PARAMS[name])
+        axes.append([(name, cast(v)) for v in values.split(',')])
+    return [dict(combo) for combo in itertools.product(*axes)] if axes else [{}]
+
+
+def positive_int(value: str) -> int:
+    """1以上の整数（argparse の type 用）"""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1: {value}")
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GA Novelist 集団進化シミュレーター')
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--generations', type=int, default=1000)
+    parser.add_argument('--operator', choices=list(OPERATORS),
+                        help='全ルームに同じオペレーターを使う（省略時は全オペレーターを割り当て）')
+    parser.add_argument('--sweep', action='append', default=[],
+                        help='パラメータスイープ（例: tournament_size=2,3,5）。複数指定で直積')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stats-every', type=positive_int, default=10,
+                        help='統計を記録する世代間隔（1以上）')
+    parser.add_argument('--output', help='結果をJSONで保存するファイル')
+    args = parser.parse_args()
+
+    operators = [args.operator] * args.rooms if args.operator else None
+    results = []
+
+    print(f"🧬 Simulating {args.rooms} rooms x {args.generations} generations")
+    for overrides in parse_sweep(args.sweep):
+        result = simulate(args.rooms, args.generations, operators, overrides,
+                          args.seed, args.stats_every)
+        results.append(result)
+
+        final = result['final']
+        label = ', '.join(f"{k}={v}" for k, v in overrides.items()) or 'default'
+        mean_gen = result['mean_convergence_generation']
+        print(f"  [{label}] {result['elapsed_seconds']:.2f}s, "
+              f"converged {result['converged_fraction']:.0%}"
+              + (f" at gen {mean_gen:.1f} (mean)" if mean_gen is not None else "")
+              + f", best={final['best_fitness']:.3f}, diversity={final['diversity']:.4f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Saved {len(results)} runs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()